@@ -0,0 +1,36 @@
+"""scan history keyset pagination index; scan_time not null
+
+Revision ID: b2e7c4d91f03
+Revises: a6d3f0b8c215
+Create Date: 2026-10-18 16:21:09.318472
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2e7c4d91f03'
+down_revision = 'a6d3f0b8c215'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # the scan time of these rows is unknown; the epoch sorts them last
+    op.execute("UPDATE scan_history SET scan_time = 'epoch' WHERE scan_time IS NULL")
+    op.alter_column('scan_history', 'scan_time',
+               existing_type=sa.TIMESTAMP(timezone=True),
+               nullable=False,
+               existing_server_default=sa.text('now()'))
+    op.drop_index('ix_scan_history_scan_time', table_name='scan_history')
+    op.create_index('ix_scan_history_scan_time_id', 'scan_history', [sa.text('scan_time DESC'), sa.text('id DESC')], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_scan_history_scan_time_id', table_name='scan_history')
+    op.create_index('ix_scan_history_scan_time', 'scan_history', ['scan_time'], unique=False)
+    op.alter_column('scan_history', 'scan_time',
+               existing_type=sa.TIMESTAMP(timezone=True),
+               nullable=True,
+               existing_server_default=sa.text('now()'))
@@ -0,0 +1,24 @@
+"""partial index on unread notifications
+
+Revision ID: c8f1a3d5e720
+Revises: b2e7c4d91f03
+Create Date: 2026-10-18 17:12:44.905126
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c8f1a3d5e720'
+down_revision = 'b2e7c4d91f03'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_notifications_to_unread', 'notifications', ['to'], unique=False, postgresql_where=sa.text('is_read = false'))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_notifications_to_unread', table_name='notifications')
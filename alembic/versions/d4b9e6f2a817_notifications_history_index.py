@@ -0,0 +1,24 @@
+"""notifications history index
+
+Revision ID: d4b9e6f2a817
+Revises: c8f1a3d5e720
+Create Date: 2026-10-18 19:40:26.117352
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4b9e6f2a817'
+down_revision = 'c8f1a3d5e720'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_notifications_to_created_at_id', 'notifications', ['to', sa.text('created_at DESC'), sa.text('id DESC')], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_notifications_to_created_at_id', table_name='notifications')
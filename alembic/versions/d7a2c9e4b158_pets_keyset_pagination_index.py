@@ -0,0 +1,33 @@
+"""pets keyset pagination index; created_at not null
+
+Revision ID: d7a2c9e4b158
+Revises: c41f7d2e9a63
+Create Date: 2026-10-18 11:02:17.648310
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7a2c9e4b158'
+down_revision = 'c41f7d2e9a63'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("UPDATE pets SET created_at = COALESCE(updated_at, now()) WHERE created_at IS NULL")
+    op.alter_column('pets', 'created_at',
+               existing_type=sa.TIMESTAMP(timezone=True),
+               nullable=False,
+               existing_server_default=sa.text('now()'))
+    op.create_index('ix_pets_created_at_id', 'pets', [sa.text('created_at DESC'), sa.text('id DESC')], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_pets_created_at_id', table_name='pets')
+    op.alter_column('pets', 'created_at',
+               existing_type=sa.TIMESTAMP(timezone=True),
+               nullable=True,
+               existing_server_default=sa.text('now()'))
@@ -0,0 +1,38 @@
+"""trigram search indexes
+
+Revision ID: e83b5f1c6d20
+Revises: d7a2c9e4b158
+Create Date: 2026-10-18 11:48:05.213947
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e83b5f1c6d20'
+down_revision = 'd7a2c9e4b158'
+branch_labels = None
+depends_on = None
+
+TRIGRAM_INDEXES = [
+    ('ix_pets_name_trgm', 'pets', 'name'),
+    ('ix_pets_breed_trgm', 'pets', 'breed'),
+    ('ix_users_firstname_trgm', 'users', 'firstname'),
+    ('ix_users_lastname_trgm', 'users', 'lastname'),
+    ('ix_products_product_name_trgm', 'products', 'product_name'),
+    ('ix_products_description_trgm', 'products', 'description'),
+]
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for name, table, column in TRIGRAM_INDEXES:
+        op.create_index(name, table, [column], unique=False,
+                        postgresql_using='gin', postgresql_ops={column: 'gin_trgm_ops'})
+
+
+def downgrade() -> None:
+    for name, table, column in reversed(TRIGRAM_INDEXES):
+        op.drop_index(name, table_name=table)
+    # the extension is left installed; other objects may depend on it
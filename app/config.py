@@ -1,3 +1,5 @@
+import os
+
 from pydantic import BaseSettings, EmailStr
 
 
@@ -17,6 +19,50 @@ class Settings(BaseSettings):
 
     CLIENT_ORIGIN: str
 
+    # per worker process; size so that workers * (pool size + overflow)
+    # stays below Postgres max_connections
+    DB_ECHO: bool = False
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    # prepared statements cached per connection; 0 behind a transaction-mode pgbouncer
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    DB_COMMAND_TIMEOUT: int = 60
+
+    # optional read replica; reads fall back to the primary when unset
+    POSTGRES_REPLICA_HOSTNAME: str = ''
+    POSTGRES_REPLICA_PORT: int = 0
+    REPLICA_STICKY_SECONDS: int = 5
+
+    # dashboard counters may be this old; 0 counts on every request
+    DASHBOARD_MAX_STALENESS_SECONDS: int = 30
+
+    SCAN_ROLLUP_INTERVAL_SECONDS: int = 60
+    # scans younger than this are left for the next run, so rows still in
+    # the scan history write buffer are not skipped
+    SCAN_ROLLUP_LAG_SECONDS: int = 120
+
+    # unread notification counts are kept in memory this long per worker
+    NOTIFICATION_COUNT_TTL_SECONDS: int = 30
+    NOTIFICATION_COUNT_MAX_USERS: int = 10000
+    # messages queued per connection before a slow client is dropped
+    NOTIFICATION_QUEUE_SIZE: int = 100
+    NOTIFICATION_HEARTBEAT_SECONDS: int = 25
+    # notifications an event stream replays after Last-Event-ID; with more
+    # than that the client is told to reload its history instead
+    NOTIFICATION_REPLAY_LIMIT: int = 100
+    # with the bridge, notifications reach sockets held by any worker
+    # through LISTEN/NOTIFY on NOTIFICATION_CHANNEL
+    NOTIFICATION_BRIDGE_ENABLED: bool = True
+    NOTIFICATION_CHANNEL: str = 'notifications'
+    NOTIFICATION_BRIDGE_FLUSH_MS: int = 50
+    NOTIFICATION_BRIDGE_MAX_PENDING: int = 10000
+
+    # rows fetched per round trip from the server-side cursor of an export
+    SCAN_EXPORT_BATCH_SIZE: int = 1000
+
     VERIFICATION_SECRET: str
 
     EMAIL_HOST: str
@@ -33,6 +79,43 @@ class Settings(BaseSettings):
     
     ENCRYPTION_KEY:str
 
+    SCAN_BUFFER_ENABLED: bool = True
+    SCAN_BUFFER_BATCH_SIZE: int = 500
+    SCAN_BUFFER_FLUSH_MS: int = 250
+    SCAN_BUFFER_MAX_PENDING: int = 10000
+
+    # 'inline' bumps no_of_scans in the scan statement, 'buffered' applies
+    # coalesced deltas, 'history' recounts touched tags from scan_history
+    SCAN_COUNTER_MODE: str = 'buffered'
+    SCAN_COUNTER_FLUSH_MS: int = 1000
+
+    QR_CACHE_DIR: str = 'app/userdata/qrcodes'
+    QR_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    QR_RENDER_WORKERS: int = os.cpu_count() or 1
+
+    PRINT_JOB_DIR: str = 'app/files/print_jobs'
+    PRINT_JOB_WORKERS: int = 1
+    PRINT_JOB_POLL_SECONDS: int = 5
+    PRINT_JOB_STALE_SECONDS: int = 300
+    # finished jobs' archives are deleted this long after they finish
+    PRINT_JOB_RETENTION_SECONDS: int = 7 * 24 * 60 * 60
+
+    AUTH_CACHE_TTL_SECONDS: int = 60
+    AUTH_CACHE_MAX_USERS: int = 10000
+
+    # embed verified/role/token version in access tokens and check them
+    # against the revocation set instead of the users table
+    AUTH_TOKEN_CLAIMS: bool = False
+    # how often revocations made by other workers are pulled in; 0 keeps
+    # the revocation set in-process only
+    AUTH_REVOCATION_SYNC_SECONDS: int = 5
+
+    PASSWORD_HASH_WORKERS: int = min(4, os.cpu_count() or 1)
+    PASSWORD_HASH_MAX_WAITING: int = 200
+
+    PROFILE_ENCRYPTION_SECRET: str = 'PetNFC1234'
+    PROFILE_ENCRYPTION_OFFLOAD_BYTES: int = 64 * 1024
+
     class Config:
         env_file = './.env'
 
@@ -22,17 +22,96 @@ from .config import settings
 
 import os
 from typing import List
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.sql.dml import UpdateBase
+
+from . import read_routing
 
 Base = declarative_base()
 
 DATABASE_URL = f"postgresql+asyncpg://{settings.POSTGRES_USER}:{settings.POSTGRES_PASSWORD}@{settings.POSTGRES_HOSTNAME}:{settings.DATABASE_PORT}/{settings.POSTGRES_DB}"
 # DATABASE_URL = os.environ.get("DATABASE_URL")
 
-engine = create_async_engine(DATABASE_URL, echo=True, future=True)
+# checked-out high-water mark per engine, for sizing the pool
+peak_checked_out = {}
+
+
+def create_engine_from_settings(url: str) -> AsyncEngine:
+    new_engine = create_async_engine(
+        url,
+        echo=settings.DB_ECHO,
+        future=True,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        connect_args={
+            'prepared_statement_cache_size': settings.DB_STATEMENT_CACHE_SIZE,
+            'statement_cache_size': settings.DB_STATEMENT_CACHE_SIZE,
+            'command_timeout': settings.DB_COMMAND_TIMEOUT or None,
+        },
+    )
+    pool = new_engine.sync_engine.pool
+    peak_checked_out[pool] = 0
+
+    @event.listens_for(pool, 'checkout')
+    def track_checkout(dbapi_connection, connection_record, connection_proxy):
+        peak_checked_out[pool] = max(peak_checked_out[pool], pool.checkedout())
+
+    return new_engine
+
+
+def pool_stats(target: AsyncEngine) -> dict:
+    pool = target.sync_engine.pool
+    return {
+        'size': pool.size(),
+        'max_overflow': settings.DB_MAX_OVERFLOW,
+        'checked_out': pool.checkedout(),
+        'checked_in': pool.checkedin(),
+        'overflow': pool.overflow(),
+        'peak_checked_out': peak_checked_out.get(pool, 0),
+        'utilization': round(pool.checkedout() / (pool.size() + settings.DB_MAX_OVERFLOW), 2),
+    }
+
+
+engine = create_engine_from_settings(DATABASE_URL)
 SessionLocal = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
 
+if settings.POSTGRES_REPLICA_HOSTNAME:
+    REPLICA_DATABASE_URL = f"postgresql+asyncpg://{settings.POSTGRES_USER}:{settings.POSTGRES_PASSWORD}@{settings.POSTGRES_REPLICA_HOSTNAME}:{settings.POSTGRES_REPLICA_PORT or settings.DATABASE_PORT}/{settings.POSTGRES_DB}"
+    read_engine = create_engine_from_settings(REPLICA_DATABASE_URL)
+else:
+    read_engine = engine
+
+
+class RoutingSession(Session):
+    """Reads from the replica, writes to the primary.
+
+    Once the session has written anything, or the request or client has
+    committed recently, every later statement goes to the primary too so it
+    sees its own writes.
+    """
+
+    wrote = False
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self._flushing or isinstance(clause, UpdateBase):
+            self.wrote = True
+        if self.wrote or read_routing.prefer_primary():
+            return engine.sync_engine
+        return read_engine.sync_engine
+
+
+ReadSessionLocal = sessionmaker(class_=AsyncSession, sync_session_class=RoutingSession, expire_on_commit=False)
+
+
+@event.listens_for(Session, 'after_commit')
+def remember_commit(session):
+    read_routing.mark_write()
+
 async def init_db():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
@@ -54,3 +133,10 @@ async def get_session() -> AsyncSession:
         finally:
             await session.close()
 
+
+async def get_read_session() -> AsyncSession:
+    async with ReadSessionLocal() as session:
+        try:
+            yield session
+        finally:
+            await session.close()
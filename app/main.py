@@ -1,12 +1,23 @@
 from uuid import UUID
-from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+from fastapi import Depends, FastAPI, Request, WebSocket, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from app import models
 from app.config import settings
 from app.database import init_db
-from app.routers import user, auth, post, pets, city, country, state, feedback, fees, product, dashboard, scan
+from app.oauth2 import require_websocket_user
+from app.services.scan_writer import scan_writer
+from app.services.scan_counter import scan_counter
+from app.services.qr_zip import shutdown_render_pool
+from app.services.print_jobs import print_job_runner
+from app.services.token_revocations import token_revocations
+from app.services.password_hasher import password_hasher
+from app.services.notification_hub import notification_hub
+from app.services.notification_bridge import notification_bridge
+from app.services.scan_rollups import scan_rollup_worker
+from app.read_routing import ReadYourWritesMiddleware
+from app.routers import user, auth, post, pets, city, country, state, feedback, fees, product, dashboard, scan, print_jobs, metrics, notifications
 
 
 from starlette.exceptions import HTTPException as StarletteHTTPException
@@ -15,8 +26,7 @@ from pydantic import BaseModel
 
 from fastapi.staticfiles import StaticFiles
 # from aiofiles import open as async_open
-import os, json
-from sqlalchemy import event
+import os
 
 app = FastAPI()
 
@@ -60,6 +70,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if settings.POSTGRES_REPLICA_HOSTNAME:
+    app.add_middleware(ReadYourWritesMiddleware, sticky_seconds=settings.REPLICA_STICKY_SECONDS)
+
 
 app.include_router(auth.router, tags=['Auth'], prefix='/api/v2/auth')
 app.include_router(user.router, tags=['Users'], prefix='/api/v2/user')
@@ -73,71 +86,45 @@ app.include_router(country.router, tags=['Countries'], prefix='/api/v2/country')
 app.include_router(product.router, tags=['Products'], prefix='/api/v2/product')
 app.include_router(dashboard.router, tags=['Dashboard'], prefix='/api/v2/dashboard')
 app.include_router(scan.router, tags=['Scan History'], prefix='/api/v2/scan-history')
+app.include_router(print_jobs.router, tags=['Print Jobs'], prefix='/api/v2/print-jobs')
+app.include_router(metrics.router, tags=['Metrics'], prefix='/api/v2/metrics')
+app.include_router(notifications.router, tags=['Notifications'], prefix='/api/v2/notifications')
 
 
 @app.on_event("startup")
 async def on_startup():
     await init_db()
+    if settings.SCAN_BUFFER_ENABLED:
+        await scan_writer.start()
+    if settings.SCAN_COUNTER_MODE != 'inline':
+        await scan_counter.start()
+    await print_job_runner.start()
+    if settings.AUTH_TOKEN_CLAIMS:
+        await token_revocations.start()
+    await scan_rollup_worker.start()
+    if settings.NOTIFICATION_BRIDGE_ENABLED:
+        await notification_bridge.start()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    # drain scan history first so a 'history' recount sees every row
+    await scan_writer.stop()
+    await scan_counter.stop()
+    await print_job_runner.stop()
+    await token_revocations.stop()
+    await scan_rollup_worker.stop()
+    await notification_bridge.stop()
+    shutdown_render_pool()
+    password_hasher.shutdown()
 
 @app.get('/api/v2')
 def root():
     return {'message': 'Hello World'}
 
-# @app.websocket("/ws")
-# async def websocket_endpoint(websocket: WebSocket):
-#     await websocket.accept()
-#     while True:
-#         data = await websocket.receive_text()
-#         await websocket.send_text(f"Message text was: {data}")
-
-# Store connected WebSocket clients
-websocket_connections = {}
-# connected_clients = set()
-
-# @app.websocket("/ws/notifications/{user_id}")
-# async def websocket_notifications(websocket: WebSocket, user_id: UUID):
-#     await websocket.accept()
-#     connected_clients.add((websocket, user_id))
-
-#     try:
-#         while True:
-#             # Wait for changes in the notifications table and send updates to clients
-#             await websocket.receive_text()  # This could be a heartbeat message to keep the connection alive
-#     except WebSocketDisconnect:
-#         connected_clients.remove((websocket, user_id))
-        
-
-# WebSocket endpoint to handle connection
+# Notifications for the signed-in user are pushed here as they are created
 @app.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
-    await websocket.accept()
-    websocket_connections['1001'] = websocket
-
-    try:
-        while True:
-            # Wait for message from client
-            data = await websocket.receive_text()
-            # if data != "ping":
-                # Respond with "pong" message
-            await websocket.send_text("pong")
-    finally:
-        del websocket_connections['1001']
-        
-
-# Event listener for handling new notifications
-@event.listens_for(models.Notification, "after_insert")
-async def receive_after_insert(mapper, connection, target):
-    # Fetch connected clients for the user who should receive the notification
-    for key, value in websocket_connections.items():
-        # if user_id == target.to:
-        # Construct notification data to send over WebSocket
-        print (key)
-        print (value)
-        notification_data = {
-            "id": str(target.id),
-            "message": target.message,
-            "created_at": str(target.created_at)
-        }
-        # Send notification data as JSON to the client
-        await value.send_text(json.dumps(notification_data))
-            
\ No newline at end of file
+async def websocket_endpoint(websocket: WebSocket, user_id: str = Depends(require_websocket_user)):
+    if user_id is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await notification_hub.serve_websocket(websocket, user_id)
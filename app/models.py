@@ -1,7 +1,7 @@
 import uuid
 
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy import TIMESTAMP, Column, ForeignKey, String, Boolean, text, Float, Integer, DateTime, JSON
+from sqlalchemy import TIMESTAMP, Column, ForeignKey, Index, String, Boolean, text, Float, Integer, DateTime, JSON
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -47,10 +47,19 @@ class User(Base):
     
     status = Column(String, nullable=True, server_default='active')
     
+    # bumped to revoke every token issued before it
+    token_version = Column(Integer, nullable=False, server_default='0')
+    
     created_at = Column(TIMESTAMP(timezone=True),nullable=False, server_default=text("now()"))
     updated_at = Column(TIMESTAMP(timezone=True),nullable=False, server_default=text("now()"))
     settings = Column(JSON, nullable=True)
     
+    # trigram indexes for admin search
+    __table_args__ = (
+        Index('ix_users_firstname_trgm', firstname, postgresql_using='gin', postgresql_ops={'firstname': 'gin_trgm_ops'}),
+        Index('ix_users_lastname_trgm', lastname, postgresql_using='gin', postgresql_ops={'lastname': 'gin_trgm_ops'}),
+    )
+    
     pets = relationship('Pet', back_populates='owner', uselist=True)
 
     def to_dict(self):
@@ -113,11 +122,17 @@ class Pet(Base):
     medications = Column(JSON, nullable=True)
     vaccines = Column(JSON, nullable=True)
     
-    created_at = Column(TIMESTAMP(timezone=True),nullable=True, server_default=text("now()"))
+    created_at = Column(TIMESTAMP(timezone=True),nullable=False, server_default=text("now()"))
     created_by = Column(String, nullable=True)
     updated_at = Column(TIMESTAMP(timezone=True),nullable=True, server_default=text("now()"))
     updated_by = Column(String, nullable=True)
     
+    # keyset pagination order for the admin tag list, trigram indexes for admin search
+    __table_args__ = (
+        Index('ix_pets_created_at_id', created_at.desc(), id.desc()),
+        Index('ix_pets_name_trgm', name, postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        Index('ix_pets_breed_trgm', breed, postgresql_using='gin', postgresql_ops={'breed': 'gin_trgm_ops'}),
+    )
 
     pet_type = relationship('PetType')
     owner = relationship('User', back_populates='pets')
@@ -218,23 +233,101 @@ class Product(Base):
     updated_at = Column(TIMESTAMP(timezone=True),nullable=True, server_default=text("now()"))
     updated_by = Column(String, nullable=True)
     
+    # trigram indexes for admin search
+    __table_args__ = (
+        Index('ix_products_product_name_trgm', product_name, postgresql_using='gin', postgresql_ops={'product_name': 'gin_trgm_ops'}),
+        Index('ix_products_description_trgm', description, postgresql_using='gin', postgresql_ops={'description': 'gin_trgm_ops'}),
+    )
+    
 class ScanHistory(Base):
     __tablename__ = "scan_history"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True, nullable=False)
-    qr_code_id = Column(String, index=True)
+    qr_code_id = Column(String)
     scanned_by = Column(String, server_default='Anonymous')
-    scan_time = Column(TIMESTAMP(timezone=True),nullable=True, server_default=text("now()"))
+    scan_time = Column(TIMESTAMP(timezone=True),nullable=False, server_default=text("now()"))
     location = Column(String, nullable=True)
     scan_result = Column(String, nullable=True)
     device_info = Column(String, nullable=True)
     ip_address = Column(String, nullable=True)
     user_agent = Column(String, nullable=True)
 
+    # per-tag history in time order; also serves lookups by qr_code_id alone.
+    # (scan_time, id) backs the keyset pages and the rollup range scans
+    __table_args__ = (
+        Index('ix_scan_history_qr_code_id_scan_time', qr_code_id, scan_time),
+        Index('ix_scan_history_scan_time_id', scan_time.desc(), id.desc()),
+    )
+
+# scan counts per tag per UTC hour / day, rolled up from scan_history
+class ScanRollupHourly(Base):
+    __tablename__ = "scan_rollups_hourly"
+
+    qr_code_id = Column(String, primary_key=True)
+    bucket = Column(TIMESTAMP(timezone=False), primary_key=True)
+    scans = Column(Integer, nullable=False, server_default='0')
+
+    __table_args__ = (
+        Index('ix_scan_rollups_hourly_bucket', bucket),
+    )
+
+class ScanRollupDaily(Base):
+    __tablename__ = "scan_rollups_daily"
+
+    qr_code_id = Column(String, primary_key=True)
+    bucket = Column(TIMESTAMP(timezone=False), primary_key=True)
+    scans = Column(Integer, nullable=False, server_default='0')
+
+    __table_args__ = (
+        Index('ix_scan_rollups_daily_bucket', bucket),
+    )
+
+# scans before rolled_up_to are already counted in the rollups
+class ScanRollupWatermark(Base):
+    __tablename__ = "scan_rollup_watermark"
+
+    id = Column(Integer, primary_key=True)
+    rolled_up_to = Column(TIMESTAMP(timezone=True), nullable=True)
+
 class Notification(Base):
     __tablename__ = "notifications"
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True, nullable=False)
     to = Column(String, nullable=False)
     message= Column(String, nullable=False)
     created_at= Column(TIMESTAMP(timezone=True),nullable=True, server_default=text("now()"))
-    is_read = Column(Boolean, nullable=False, server_default='False')
\ No newline at end of file
+    is_read = Column(Boolean, nullable=False, server_default='False')
+
+    # only unread rows are indexed, which is all the badge count looks at.
+    # (to, created_at, id) backs the history pages in either direction
+    __table_args__ = (
+        Index('ix_notifications_to_unread', to, postgresql_where=text('is_read = false')),
+        Index('ix_notifications_to_created_at_id', to, created_at.desc(), id.desc()),
+    )
+
+class PrintJob(Base):
+    __tablename__ = "print_jobs"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True, nullable=False)
+    status = Column(String, nullable=False, server_default='queued', index=True)
+    unique_ids = Column(JSON, nullable=True)
+    total = Column(Integer, nullable=True)
+    completed = Column(Integer, nullable=False, server_default='0')
+    artifact_path = Column(String, nullable=True)
+    artifact_size = Column(Integer, nullable=True)
+    error = Column(String, nullable=True)
+
+    created_at = Column(TIMESTAMP(timezone=True),nullable=False, server_default=text("now()"))
+    created_by = Column(String, nullable=True)
+    updated_at = Column(TIMESTAMP(timezone=True),nullable=False, server_default=text("now()"))
+    finished_at = Column(TIMESTAMP(timezone=True),nullable=True)
+
+class TokenRevocation(Base):
+    __tablename__ = "token_revocations"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True, nullable=False)
+    user_id = Column(String, nullable=False)
+    # either a single token (jti) or every token below token_version
+    jti = Column(String, nullable=True)
+    token_version = Column(Integer, nullable=True)
+    expires_at = Column(TIMESTAMP(timezone=True), nullable=False, index=True)
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text("now()"), index=True)
@@ -1,14 +1,16 @@
 import base64
-from typing import List
-from fastapi import Depends, HTTPException, status
+from typing import List, Optional
+from fastapi import Depends, HTTPException, WebSocket, status
 from sqlalchemy import select
 from fastapi_jwt_auth import AuthJWT
 from pydantic import BaseModel, EmailStr
 
 from . import models
-from .database import get_session
+from .database import SessionLocal, get_session
 from sqlalchemy.orm import Session
 from .config import settings
+from .services.principal_cache import Principal, principal_cache
+from .services.token_revocations import token_revocations
 
 
 class Settings(BaseModel):
@@ -22,6 +24,8 @@ class Settings(BaseModel):
         settings.JWT_PUBLIC_KEY).decode('utf-8')
     authjwt_private_key: str = base64.b64decode(
         settings.JWT_PRIVATE_KEY).decode('utf-8')
+    authjwt_denylist_enabled: bool = settings.AUTH_TOKEN_CLAIMS
+    authjwt_denylist_token_checks: set = {'access', 'refresh'}
 
 
 @AuthJWT.load_config
@@ -29,6 +33,18 @@ def get_config():
     return Settings()
 
 
+@AuthJWT.token_in_denylist_loader
+def check_if_token_in_denylist(decrypted_token):
+    return token_revocations.is_revoked(decrypted_token)
+
+
+def token_claims(user: models.User) -> dict:
+    # with AUTH_TOKEN_CLAIMS, access tokens carry what require_user checks
+    if not settings.AUTH_TOKEN_CLAIMS:
+        return {}
+    return {'verified': user.verified, 'role': user.role, 'ver': user.token_version}
+
+
 class NotVerified(Exception):
     pass
 
@@ -37,18 +53,36 @@ class UserNotFound(Exception):
     pass
 
 
-async def require_user(db: Session = Depends(get_session), Authorize: AuthJWT = Depends()):
-    try:
-        Authorize.jwt_required()
-        user_id = Authorize.get_jwt_subject()
-        query = await db.execute(select(models.User).where(models.User.id == user_id))
-        user = query.scalar_one_or_none()
+async def load_principal(db: Session, user_id: str, claims: dict) -> Principal:
+    if settings.AUTH_TOKEN_CLAIMS and 'ver' in claims:
+        # revocation was already checked by jwt_required()
+        user = Principal(user_id, claims['verified'], claims['role'], None)
+    else:
+        user = principal_cache.get(user_id)
+    if user is None:
+        generation = principal_cache.generation
+        query = await db.execute(
+            select(models.User.id, models.User.verified, models.User.role, models.User.status)
+            .where(models.User.id == user_id)
+        )
+        row = query.one_or_none()
 
-        if not user:
+        if not row:
             raise UserNotFound('User no longer exist')
 
-        if not user.verified:
-            raise NotVerified('You are not verified')
+        user = Principal(user_id, row.verified, row.role, row.status)
+        principal_cache.put(user, generation)
+
+    if not user.verified:
+        raise NotVerified('You are not verified')
+    return user
+
+
+async def require_principal(db: Session = Depends(get_session), Authorize: AuthJWT = Depends()) -> Principal:
+    try:
+        Authorize.jwt_required()
+        user_id = Authorize.get_jwt_subject()
+        user = await load_principal(db, user_id, Authorize.get_raw_jwt())
 
     except Exception as e:
         error = e.__class__.__name__
@@ -64,4 +98,40 @@ async def require_user(db: Session = Depends(get_session), Authorize: AuthJWT =
                 status_code=status.HTTP_401_UNAUTHORIZED, detail='Please verify your account')
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail='Token is invalid or has expired')
+    return user
+
+
+async def require_user(user: Principal = Depends(require_principal)):
+    return user.id
+
+
+# for responses that stay open: the user is looked up in a session that is
+# closed before the response starts, rather than in the request's session
+async def require_streaming_user(Authorize: AuthJWT = Depends()):
+    async with SessionLocal() as db:
+        user = await require_principal(db, Authorize)
+    return user.id
+
+
+# browsers cannot set headers on a WebSocket, so besides the access token
+# cookie the token may come as ?token=. Returns None instead of raising,
+# the endpoint closes the socket itself
+async def require_websocket_user(websocket: WebSocket, token: str = None, Authorize: AuthJWT = Depends()) -> Optional[str]:
+    try:
+        authorization = websocket.headers.get('authorization', '')
+        if not token and authorization.startswith('Bearer '):
+            token = authorization[len('Bearer '):]
+        if token:
+            Authorize.jwt_required('websocket', token=token)
+        else:
+            Authorize.jwt_required('websocket', websocket=websocket)
+            token = websocket.cookies.get('access_token')
+        claims = Authorize.get_raw_jwt(token)
+        user_id = claims['sub']
+        # a session of its own, so no connection is held for the life of the socket
+        async with SessionLocal() as db:
+            await load_principal(db, user_id, claims)
+    except Exception as e:
+        print(e.__class__.__name__)
+        return None
     return user_id
@@ -0,0 +1,59 @@
+from contextvars import ContextVar
+import time
+
+from starlette.datastructures import MutableHeaders
+from starlette.requests import HTTPConnection
+
+STICKY_COOKIE = 'read_primary_until'
+
+# per request: did this request commit, and did the client commit recently
+request_state: ContextVar[dict] = ContextVar('read_routing_state', default=None)
+
+
+def prefer_primary() -> bool:
+    state = request_state.get()
+    return state is not None and (state['wrote'] or state['sticky'])
+
+
+def mark_write():
+    state = request_state.get()
+    if state is not None:
+        state['wrote'] = True
+
+
+class ReadYourWritesMiddleware:
+    """Keeps a client on the primary for a while after it commits.
+
+    Replicas lag the primary, so a client that just saved something could
+    read the old row back from a replica. Any commit during a request sets a
+    short-lived cookie; while it is valid, read sessions for that client go
+    to the primary. A commit earlier in the same request has the same effect.
+    """
+
+    def __init__(self, app, sticky_seconds: int):
+        self.app = app
+        self.sticky_seconds = sticky_seconds
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            sticky = float(HTTPConnection(scope).cookies.get(STICKY_COOKIE, 0)) > time.time()
+        except ValueError:
+            sticky = False
+        state = {'wrote': False, 'sticky': sticky}
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start' and state['wrote']:
+                headers = MutableHeaders(scope=message)
+                until = int(time.time() + self.sticky_seconds)
+                headers.append('set-cookie', f'{STICKY_COOKIE}={until}; Max-Age={self.sticky_seconds}; Path=/; HttpOnly; SameSite=Lax')
+            await send(message)
+
+        token = request_state.set(state)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_state.reset(token)
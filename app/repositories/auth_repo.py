@@ -10,6 +10,7 @@ from app.schemas.pet_schema import UpdatePetSchema
 from ..schemas.user_schema import CreateUserSchema, UpdateUserSchema, UserResponse
 from sqlalchemy.orm import Session
 from .. import models
+from ..services.password_hasher import password_hasher
 
 from random import randbytes
 import hashlib
@@ -68,7 +69,7 @@ async def create_user(db: Session, request: Request, payload: CreateUserSchema):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail='Passwords do not match')
     #  Hash the password
-    payload.password = utils.hash_password(payload.password)
+    payload.password = await password_hasher.hash(payload.password)
     del payload.passwordConfirm
     payload.role = 'user'
     payload.verified = False
@@ -3,7 +3,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from psycopg2 import IntegrityError
 from pydantic import EmailStr
-from sqlalchemy import Column, DateTime, MetaData, String, Table, and_, delete, func, or_, select
+from sqlalchemy import Column, DateTime, MetaData, String, Table, and_, delete, func, or_, select, true
 
 from app import utils
 from app.email import Email
@@ -18,42 +18,59 @@ import pyotp
 from datetime import datetime, timedelta
 import pytz
 import secrets
+import asyncio
+import time
 
 
 router = APIRouter()
 
-async def get_users(db: Session):
-    try:
-        query = await db.execute(
-            select(models.User).where(models.User.role == "user")
-        )
-        users: models.User = query.scalars().all()
-        
-        return users
-    
-    except TimeoutError:
-        raise HTTPException(status_code=500, detail="Task timed out")
-    
-async def get_pets(db: Session):
-    try:
-        query = await db.execute(
-            select(models.Pet)
+# last computed counts, served while younger than DASHBOARD_MAX_STALENESS_SECONDS
+snapshot = {'counts': None, 'taken_at': 0.0}
+snapshot_lock = asyncio.Lock()
+
+
+# every dashboard counter in one round trip; each table is scanned once
+async def count_dashboard_data(db: Session) -> dict:
+    users = (
+        select(
+            func.count().filter(models.User.verified == True).label('verified'),
+            func.count().filter(models.User.verified == False).label('not_verified'),
+            func.count().label('total'),
         )
-        pets: models.Pet = query.scalars().all()
-        
-        return pets
-    
-    except TimeoutError:
-        raise HTTPException(status_code=500, detail="Task timed out")
-    
-async def get_feedbacks(db: Session):
-    try:
-        query = await db.execute(
-            select(models.Feedback)
+        .where(models.User.role == "user")
+        .subquery()
+    )
+    pets = (
+        select(
+            func.count().filter(models.Pet.owner_id.is_not(None)).label('taken'),
+            func.count().filter(models.Pet.owner_id.is_(None)).label('available'),
+            func.count().label('total'),
         )
-        pets: models.Pet = query.scalars().all()
-        
-        return pets
-    
-    except TimeoutError:
-        raise HTTPException(status_code=500, detail="Task timed out")
+        .select_from(models.Pet)
+        .subquery()
+    )
+    feedbacks = select(func.count().label('total')).select_from(models.Feedback).subquery()
+
+    query = await db.execute(
+        select(users, pets.c.taken, pets.c.available, pets.c.total.label('pets_total'), feedbacks.c.total.label('feedback_total'))
+        .select_from(users.join(pets, true()).join(feedbacks, true()))
+    )
+    row = query.one()
+    return {
+        'user': {'verified': row.verified, 'not_verified': row.not_verified, 'total': row.total},
+        'qrcode': {'taken': row.taken, 'available': row.available, 'total': row.pets_total},
+        'feedback': {'total': row.feedback_total},
+        'order': {'total': 0},
+    }
+
+
+async def get_dashboard_counts(db: Session) -> dict:
+    max_age = settings.DASHBOARD_MAX_STALENESS_SECONDS
+    if snapshot['counts'] is not None and time.monotonic() - snapshot['taken_at'] < max_age:
+        return snapshot['counts']
+    # one refresh at a time; the others wait for it instead of recounting
+    async with snapshot_lock:
+        if snapshot['counts'] is None or time.monotonic() - snapshot['taken_at'] >= max_age:
+            snapshot['counts'] = await count_dashboard_data(db)
+            snapshot['taken_at'] = time.monotonic()
+    return snapshot['counts']
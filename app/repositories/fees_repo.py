@@ -16,7 +16,7 @@ from sqlalchemy.orm import Session
 from fastapi import Depends, HTTPException, UploadFile, status, APIRouter, Response
 from ..database import get_session
 from app.oauth2 import require_user
-from ..repositories import user_repo
+from ..repositories import user_repo, filtering, pagination, text_search
 
 router = APIRouter()
 
@@ -25,69 +25,29 @@ USERDATA_DIR = os.path.join("app", "userdata")
 
 CURRENCY_CODES = [currency["Code"].upper() for currency in utils.get_currency()]
 
-# get fees with authentication
-async def get_fees(db: Session, limit: int, page: int, search: str = '', filters: str = '', show_all: bool = True):
-    skip = (page - 1) * limit
-    
-    search_condition = (
-        or_(
-            or_(
-                and_(
-                    models.Fee.display_name.is_(None),  # NULL values
-                    search == "",  # Empty search term
-                ),
-                and_(
-                    models.Fee.fee_type.is_(None),  # NULL values
-                    search == "",  # Empty search term
-                )
-            ),
-            models.Fee.display_name.ilike(f"%{search}%"),  # Non-empty names matching the search term
-            models.Fee.fee_type.ilike(f"%{search}%"),  # Non-empty names matching the search term
-        )
-    )
-    
-    filter_items = filters.split(',') if filters else []
-    for item in filter_items:
-        if len(item.split('=')) >= 2:
-            key, value = item.split('=')
-            if key and value:
-                if key == 'operation':
-                    if value.upper() in ["ADD", "SUB", "MUL", "DIV"]:
-                        search_condition = and_(search_condition, models.Fee.operation == value.upper())
-                
-                elif key == 'currency':
-                    if value.upper() in CURRENCY_CODES:
-                        search_condition = and_(search_condition, models.Fee.currency == value.upper())
-
-    total_items_query = (
-        select(func.count())
-        .select_from(models.Fee)
-        .filter(search_condition)
-    )
+FEE_FILTERS: filtering.FilterSpec = {
+    'operation': lambda value: models.Fee.operation == value.upper() if value.upper() in ["ADD", "SUB", "MUL", "DIV"] else None,
+    'currency': lambda value: models.Fee.currency == value.upper() if value.upper() in CURRENCY_CODES else None,
+}
 
-    if not show_all:
-        total_items_query = total_items_query.where(models.Fee.enabled == True)
-
-    total_items = await db.scalar(total_items_query)
-    
-    total_pages = -(-total_items // limit)
-    
-    common_query = (
-        select(models.Fee)
-        .filter(search_condition)
-        .group_by(models.Fee.id)
-        .order_by(models.Fee.created_at.desc())  # Order by id
-        .limit(limit)
-        .offset(skip)
-    )
+FEE_SORT_COLUMNS = {
+    'display_name': models.Fee.display_name,
+    'fee_type': models.Fee.fee_type,
+    'amount': models.Fee.amount,
+    'created_at': models.Fee.created_at,
+}
 
+# get fees with authentication
+async def get_fees(db: Session, limit: int, page: int, search: str = '', filters: str = '', show_all: bool = True, sort: str = ''):
+    conditions = [text_search.search_condition(search, models.Fee.display_name, models.Fee.fee_type)]
     if not show_all:
-        common_query = common_query.where(models.Fee.enabled == True)
+        conditions.append(models.Fee.enabled == True)
+    query = select(models.Fee).where(filtering.compile_filters(filters, FEE_FILTERS, *conditions))
 
-    query = await db.execute(common_query)
-    fees = query.scalars().all()
+    order_by = filtering.compile_sort(sort, FEE_SORT_COLUMNS) or [models.Fee.created_at.desc()]
+    fees, total_items = await pagination.fetch_page(db, query.order_by(*order_by, models.Fee.id), limit, page)
     
-    return {'status': 'success', 'results': len(fees), 'total_pages': total_pages, 'total_items':total_items, 'fees': fees}
+    return {'status': 'success', 'results': len(fees), 'total_pages': pagination.total_pages(total_items, limit), 'total_items':total_items, 'fees': fees}
 
 # create fees without authentication
 async def create_fees(fees: CreateFeeSchema, user_id: str, db: Session):
@@ -0,0 +1,42 @@
+from typing import Callable, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import and_, true
+
+# The list endpoints take `filters` as "key=value,key=value" and `sort` as
+# "field,-field". Each repository declares which keys and fields it accepts;
+# anything else never reaches the SQL. A filter returns None for a value it
+# does not recognise, which leaves the listing unfiltered as before.
+FilterSpec = Dict[str, Callable[[str], Optional[object]]]
+
+
+def parse_filters(filters: str) -> List[Tuple[str, str]]:
+    items = []
+    for item in filters.split(',') if filters else []:
+        parts = item.split('=')
+        if len(parts) > 2:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid filter '{item}'")
+        if len(parts) == 2 and parts[0] and parts[1]:
+            items.append((parts[0], parts[1]))
+    return items
+
+
+def compile_filters(filters: str, spec: FilterSpec, *conditions):
+    clauses = list(conditions)
+    for key, value in parse_filters(filters):
+        if key in spec:
+            clause = spec[key](value)
+            if clause is not None:
+                clauses.append(clause)
+    return and_(true(), *clauses)
+
+
+def compile_sort(sort: str, columns: Dict[str, object]) -> List:
+    order_by = []
+    for field in sort.split(',') if sort else []:
+        field = field.strip()
+        name = field.lstrip('-')
+        if name not in columns:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid sort field '{name}'")
+        order_by.append(columns[name].desc() if field.startswith('-') else columns[name].asc())
+    return order_by
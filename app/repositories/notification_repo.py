@@ -0,0 +1,102 @@
+from datetime import datetime
+from typing import List
+import uuid
+
+from sqlalchemy import func, select, tuple_, update
+from sqlalchemy.orm import Session
+
+from . import pagination
+
+from .. import models
+from ..database import SessionLocal
+from ..services.notification_counts import unread_counts
+
+
+# answered from the partial index on unread notifications
+async def count_unread(db: Session, user_id: str) -> int:
+    return await db.scalar(
+        select(func.count())
+        .select_from(models.Notification)
+        .where(models.Notification.to == user_id)
+        .where(models.Notification.is_read == False)
+    )
+
+
+async def get_unread_count(db: Session, user_id: str) -> int:
+    count = unread_counts.get(user_id)
+    if count is None:
+        generation = unread_counts.generation(user_id)
+        count = await count_unread(db, user_id)
+        unread_counts.put(user_id, count, generation)
+    return count
+
+
+# oldest first, strictly after (created_at, id)
+async def get_notifications_after(db: Session, user_id: str, created_at: datetime, id: uuid.UUID, limit: int) -> List[models.Notification]:
+    query = await db.execute(
+        select(models.Notification)
+        .where(models.Notification.to == user_id)
+        .where(tuple_(models.Notification.created_at, models.Notification.id) > (created_at, id))
+        .order_by(models.Notification.created_at, models.Notification.id)
+        .limit(limit)
+    )
+    return query.scalars().all()
+
+
+def notification_cursor(notification: models.Notification) -> str:
+    return pagination.encode_cursor(notification.created_at, str(notification.id))
+
+
+# newest first in keyset pages; with since (the sync_cursor of an earlier
+# fetch) only what arrived after it, oldest first. sync_cursor is where the
+# next since fetch picks up
+async def get_notifications(db: Session, user_id: str, limit: int, cursor: str = None, since: str = None) -> dict:
+    if since:
+        created_at, id = pagination.decode_keyset_cursor(since)
+        notifications = await get_notifications_after(db, user_id, created_at, id, limit + 1)
+        has_more = len(notifications) > limit
+        notifications = notifications[:limit]
+        sync_cursor = notification_cursor(notifications[-1]) if notifications else since
+        return {'status': 'success', 'results': len(notifications), 'notifications': notifications,
+                'has_more': has_more, 'sync_cursor': sync_cursor}
+
+    # fetch one extra row to know whether another page follows
+    query = (
+        select(models.Notification)
+        .where(models.Notification.to == user_id)
+        .order_by(models.Notification.created_at.desc(), models.Notification.id.desc())
+        .limit(limit + 1)
+    )
+    if cursor:
+        created_at, id = pagination.decode_keyset_cursor(cursor)
+        query = query.where(tuple_(models.Notification.created_at, models.Notification.id) < (created_at, id))
+    query = await db.execute(query)
+    notifications = query.scalars().all()
+
+    next_cursor = None
+    if len(notifications) > limit:
+        notifications = notifications[:limit]
+        next_cursor = notification_cursor(notifications[-1])
+    sync_cursor = notification_cursor(notifications[0]) if notifications and not cursor else None
+    return {'status': 'success', 'results': len(notifications), 'notifications': notifications,
+            'next_cursor': next_cursor, 'sync_cursor': sync_cursor}
+
+
+# one UPDATE for the whole backlog, up to and including the up_to cursor if
+# given. Runs in a session of its own, so it is safe outside the request
+async def mark_read(user_id: str, up_to: str = None) -> int:
+    query = (
+        update(models.Notification)
+        .where(models.Notification.to == user_id)
+        .where(models.Notification.is_read == False)
+        .values(is_read=True)
+        .execution_options(synchronize_session=False)
+    )
+    if up_to:
+        created_at, id = pagination.decode_keyset_cursor(up_to)
+        query = query.where(tuple_(models.Notification.created_at, models.Notification.id) <= (created_at, id))
+
+    async with SessionLocal() as db:
+        result = await db.execute(query)
+        await db.commit()
+    return result.rowcount
@@ -0,0 +1,88 @@
+import base64
+from datetime import datetime
+import json
+from typing import Any, Callable, List, Optional, Tuple
+import uuid
+
+from fastapi import HTTPException, status
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+TOTAL_MODES = ('exact', 'estimate', 'none')
+
+
+def encode_cursor(*values) -> str:
+    payload = json.dumps([value.isoformat() if isinstance(value, datetime) else value for value in values])
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor: str, size: int) -> List:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        if not isinstance(values, list) or len(values) != size:
+            raise ValueError(cursor)
+        return values
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Invalid cursor')
+
+
+def parse_datetime(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value is not None else None
+
+
+# a (timestamp, id) keyset position, with both fields checked, so a tampered
+# cursor is a 400 rather than an error from the query. id_type is the type of
+# the table's primary key: uuid.UUID, or int for integer keys
+def decode_keyset_cursor(cursor: str, id_type: Callable[[Any], Any] = uuid.UUID) -> Tuple[datetime, Any]:
+    timestamp, id = decode_cursor(cursor, 2)
+    try:
+        timestamp = datetime.fromisoformat(timestamp)
+        # int() would also take '7', 7.5 or true
+        if id_type is int and (not isinstance(id, int) or isinstance(id, bool)):
+            raise ValueError(id)
+        id = id_type(id)
+    except (TypeError, ValueError, AttributeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Invalid cursor')
+    # cursors are cut from timestamptz columns; a naive one cannot be compared
+    if timestamp.tzinfo is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Invalid cursor')
+    return timestamp, id
+
+
+# row estimate from the planner, so a deep listing never pays for COUNT(*)
+async def estimate_count(db: Session, query) -> int:
+    connection = await db.connection()
+    compiled = query.compile(dialect=connection.dialect)
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    result = await connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", params)
+    plan = result.scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+async def count_items(db: Session, query, total: str = 'exact') -> Optional[int]:
+    if total == 'none':
+        return None
+    if total == 'estimate':
+        return await estimate_count(db, query)
+    return await db.scalar(select(func.count()).select_from(query.order_by(None).subquery()))
+
+
+def total_pages(total_items: Optional[int], limit: int) -> Optional[int]:
+    return -(-total_items // limit) if total_items is not None else None
+
+
+# one round trip: the total rides along on every row of the page as count(*) OVER ()
+async def fetch_page(db: Session, query, limit: int, page: int) -> Tuple[List, int]:
+    result = await db.execute(
+        query.add_columns(func.count().over().label('total_items'))
+        .limit(limit)
+        .offset((page - 1) * limit)
+    )
+    rows = result.all()
+    if rows:
+        return [row[0] for row in rows], rows[0].total_items
+    # past the last page there is no row to carry the total
+    total_items = await count_items(db, query) if page > 1 else 0
+    return [], total_items
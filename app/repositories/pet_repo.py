@@ -5,7 +5,7 @@ from typing import List
 import uuid
 
 from pydantic import EmailStr
-from sqlalchemy import func, select, update
+from sqlalchemy import func, insert, select, update
 
 from app import utils
 from app.email import Email
@@ -16,14 +16,17 @@ from sqlalchemy.orm import Session
 from fastapi import Depends, HTTPException, Request, UploadFile, status, APIRouter, Response
 from ..database import get_session
 from app.oauth2 import require_user
-from ..repositories import user_repo, auth_repo
-from sqlalchemy import or_, and_, inspect
+from ..repositories import user_repo, auth_repo, filtering, pagination, text_search
+from sqlalchemy import or_, and_, inspect, tuple_
 
 router = APIRouter()
 
 
 USERDATA_DIR = os.path.join("app", "userdata")
 
+# rows per INSERT; two bind parameters each keeps well under asyncpg's 32767 limit
+GENERATE_CHUNK_SIZE = 5000
+
 
 async def get_all_pets(db: Session):
     query = await db.execute(
@@ -35,57 +38,81 @@ async def get_all_pets(db: Session):
     return pets
 
 
-# get pets without authentication
-async def get_pets(db: Session, limit: int, page: int, search: str = '', filters: str = ''):
-    skip = (page - 1) * limit
-    
-    search_condition = (
-        or_(
-            or_(
-                and_(
-                    models.Pet.name.is_(None),  # NULL values
-                    search == "",  # Empty search term
-                ),
-                and_(
-                    models.Pet.breed.is_(None),  # NULL values
-                    search == "",  # Empty search term
-                )
-            ),
-            models.Pet.name.ilike(f"%{search}%"),  # Non-empty names matching the search term
-            models.Pet.breed.ilike(f"%{search}%"),  # Non-empty names matching the search term
-        )
-    )
-    
-    filter_items = filters.split(',') if filters else []
-    for item in filter_items:
-        if len(item.split('=')) >= 2:
-            key, value = item.split('=')
-            if key and value:
-                if key == 'qr':
-                    if value.lower() == "not-used":
-                        search_condition = and_(search_condition, models.Pet.owner_id.is_(None))
-                    elif value.lower() == "used":
-                        search_condition = and_(search_condition, models.Pet.owner_id.is_not(None))
-
-
-    total_items = await db.scalar(
-        select(func.count())
-        .select_from(models.Pet)
-        .filter(search_condition)
-    )
-    
-    total_pages = -(-total_items // limit)
-    
-    query = await db.execute(
-            select(models.Pet)
-            .filter(search_condition)
-            .group_by(models.Pet.id)
-            .order_by(models.Pet.created_at.desc())  # Order by id
-            .limit(limit)
-            .offset(skip)
+# provision blank tags with one multi-row INSERT per chunk, all in one transaction
+async def generate_pets(db: Session, num_records: int, user_id: str) -> List[uuid.UUID]:
+    unique_ids = []
+    for offset in range(0, num_records, GENERATE_CHUNK_SIZE):
+        rows = [
+            {'unique_id': uuid.uuid4(), 'created_by': user_id}
+            for _ in range(min(GENERATE_CHUNK_SIZE, num_records - offset))
+        ]
+        query = await db.execute(
+            insert(models.Pet).values(rows).returning(models.Pet.unique_id)
         )
+        unique_ids.extend(query.scalars().all())
+    await db.commit()
+    return unique_ids
+
+
+PET_FILTERS: filtering.FilterSpec = {
+    'qr': lambda value: {
+        'not-used': models.Pet.owner_id.is_(None),
+        'used': models.Pet.owner_id.is_not(None),
+    }.get(value.lower()),
+}
+
+PET_SORT_COLUMNS = {
+    'name': models.Pet.name,
+    'breed': models.Pet.breed,
+    'no_of_scans': models.Pet.no_of_scans,
+    'created_at': models.Pet.created_at,
+}
+
+# get pets without authentication
+# pass cursor ('' for the first page) for keyset pagination over (created_at, id);
+# total is 'exact', 'estimate' or 'none'
+async def get_pets(db: Session, limit: int, page: int, search: str = '', filters: str = '', cursor: str = None, total: str = 'exact', sort: str = ''):
+    search_condition = text_search.search_condition(search, models.Pet.name, models.Pet.breed)
+    base_query = select(models.Pet).where(filtering.compile_filters(filters, PET_FILTERS, search_condition))
+
+    if cursor is not None:
+        return await get_pets_after(db, base_query, limit, cursor, total)
+
+    query = base_query
+    order_by = filtering.compile_sort(sort, PET_SORT_COLUMNS)
+    if not order_by:
+        query = text_search.order_by_rank(query, search, models.Pet.name, models.Pet.breed)
+        order_by = [models.Pet.created_at.desc()]
+    query = query.order_by(*order_by, models.Pet.id.desc())
+
+    if total == 'exact':
+        pets, total_items = await pagination.fetch_page(db, query, limit, page)
+    else:
+        total_items = await pagination.count_items(db, base_query, total)
+        query = await db.execute(query.limit(limit).offset((page - 1) * limit))
+        pets = query.scalars().all()
+
+    return {'status': 'success', 'results': len(pets), 'total_pages': pagination.total_pages(total_items, limit), 'total_items':total_items, 'pets': pets}
+
+# keyset pages follow (created_at, id) alone, so they are neither ranked nor sorted
+async def get_pets_after(db: Session, base_query, limit: int, cursor: str, total: str):
+    total_items = await pagination.count_items(db, base_query, total)
+
+    # fetch one extra row to know whether another page follows
+    query = base_query.order_by(models.Pet.created_at.desc(), models.Pet.id.desc()).limit(limit + 1)
+    if cursor:
+        created_at, id = pagination.decode_keyset_cursor(cursor, int)
+        query = query.where(tuple_(models.Pet.created_at, models.Pet.id) < (created_at, id))
+
+    query = await db.execute(query)
     pets = query.scalars().all()
-    return {'status': 'success', 'results': len(pets), 'total_pages': total_pages, 'total_items':total_items, 'pets': pets}
+
+    next_cursor = None
+    if len(pets) > limit:
+        pets = pets[:limit]
+        next_cursor = pagination.encode_cursor(pets[-1].created_at, pets[-1].id)
+
+    return {'status': 'success', 'results': len(pets), 'total_pages': pagination.total_pages(total_items, limit), 'total_items':total_items, 'pets': pets, 'next_cursor': next_cursor}
 
 # get pets with authentication
 async def get_pets_by_owner_id(owner_id: str, db: Session):
@@ -351,18 +378,3 @@ async def cleanstr(filename):
         return filename
     elif name_length > 8:
         return name[:8] + ext
-    
-    
-async def read_notification(id: str, db: Session):
-    pet_query = await db.execute(
-            select(models.Notification)
-            .where(models.Notification.to == id)
-            .where(models.Notification.is_read == False)
-        )
-    notifications = pet_query.scalars().all()
-    
-    for notification in notifications:
-        notification.is_read = True
-        
-        # Commit the session to persist the changes
-        await db.commit()
\ No newline at end of file
@@ -0,0 +1,91 @@
+from datetime import timedelta
+from typing import List
+import uuid
+
+from fastapi import HTTPException, status
+from sqlalchemy import and_, func, or_, select, update
+
+from .. import models
+from sqlalchemy.orm import Session
+
+
+async def create_job(db: Session, user_id: str, unique_ids: List[str] = None):
+    job = models.PrintJob(unique_ids=unique_ids, total=len(unique_ids) if unique_ids else None, created_by=user_id)
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+    return job
+
+
+async def get_job(id: str, db: Session):
+    query = await db.execute(
+        select(models.PrintJob).where(models.PrintJob.id == id)
+    )
+    job = query.scalar_one_or_none()
+    if not job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Print job not found')
+    return job
+
+
+# claim the oldest queued job, or a running one whose worker stopped reporting
+# progress; SKIP LOCKED lets several app workers poll the same table
+async def claim_next_job(db: Session, stale_after: timedelta):
+    claimable = (
+        select(models.PrintJob.id)
+        .where(
+            or_(
+                models.PrintJob.status == 'queued',
+                and_(
+                    models.PrintJob.status == 'running',
+                    models.PrintJob.updated_at < func.now() - stale_after,
+                ),
+            )
+        )
+        .order_by(models.PrintJob.created_at.asc())
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    query = await db.execute(
+        update(models.PrintJob)
+        .where(models.PrintJob.id == claimable)
+        .values(status='running', completed=0, error=None, updated_at=func.now())
+        .returning(models.PrintJob.id, models.PrintJob.unique_ids)
+        .execution_options(synchronize_session=False)
+    )
+    job = query.first()
+    await db.commit()
+    return job
+
+
+async def update_progress(id, db: Session, **values):
+    await db.execute(
+        update(models.PrintJob)
+        .where(models.PrintJob.id == id)
+        .values(updated_at=func.now(), **values)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+
+
+# mark finished jobs older than retention as expired and return their ids,
+# so the caller can delete the archives
+async def expire_jobs(db: Session, retention: timedelta) -> List[uuid.UUID]:
+    expired = (
+        select(models.PrintJob.id)
+        .where(
+            models.PrintJob.status.in_(('done', 'failed')),
+            models.PrintJob.finished_at < func.now() - retention,
+        )
+        .with_for_update(skip_locked=True)
+    )
+    query = await db.execute(
+        update(models.PrintJob)
+        .where(models.PrintJob.id.in_(expired))
+        .values(status='expired', artifact_path=None, updated_at=func.now())
+        .returning(models.PrintJob.id)
+        .execution_options(synchronize_session=False)
+    )
+    ids = query.scalars().all()
+    await db.commit()
+    return ids
@@ -16,7 +16,7 @@ from sqlalchemy.orm import Session
 from fastapi import Depends, HTTPException, UploadFile, status, APIRouter, Response
 from ..database import get_session
 from app.oauth2 import require_user
-from ..repositories import user_repo
+from ..repositories import user_repo, filtering, pagination, text_search
 import json
 from datetime import datetime
 
@@ -34,65 +34,31 @@ class CustomJSONEncoder(json.JSONEncoder):
             return obj.isoformat()
         return super().default(obj)
 
-# get products with authentication
-async def get_products(db: Session, limit: int, page: int, search: str = '', filters: str = '', show_all: bool = True):
-    skip = (page - 1) * limit
-    
-    search_condition = (
-        or_(
-            or_(
-                and_(
-                    models.Product.product_name.is_(None),  # NULL values
-                    search == "",  # Empty search term
-                ),
-                and_(
-                    models.Product.description.is_(None),  # NULL values
-                    search == "",  # Empty search term
-                )
-            ),
-            models.Product.product_name.ilike(f"%{search}%"),  # Non-empty names matching the search term
-            models.Product.description.ilike(f"%{search}%"),  # Non-empty names matching the search term
-        )
-    )
-    
-    filter_items = filters.split(',') if filters else []
-    for item in filter_items:
-        if len(item.split('=')) >= 2:
-            key, value = item.split('=')
-            if key and value:
-                if key == 'enabled':
-                    if value:
-                        search_condition = and_(search_condition, models.Product.enabled)
-
-    total_items_query = (
-        select(func.count())
-        .select_from(models.Product)
-        .filter(search_condition)
-    )
-
-    if not show_all:
-        total_items_query = total_items_query.where(models.Product.enabled == True)
+PRODUCT_FILTERS: filtering.FilterSpec = {
+    'enabled': lambda value: models.Product.enabled == True,
+}
 
-    total_items = await db.scalar(total_items_query)
-    
-    total_pages = -(-total_items // limit)
-    
-    common_query = (
-        select(models.Product)
-        .filter(search_condition)
-        .group_by(models.Product.product_id)
-        .order_by(models.Product.created_at.desc())  # Order by id
-        .limit(limit)
-        .offset(skip)
-    )
+PRODUCT_SORT_COLUMNS = {
+    'product_name': models.Product.product_name,
+    'price': models.Product.price,
+    'category': models.Product.category,
+    'created_at': models.Product.created_at,
+}
 
+# get products with authentication
+async def get_products(db: Session, limit: int, page: int, search: str = '', filters: str = '', show_all: bool = True, sort: str = ''):
+    conditions = [text_search.search_condition(search, models.Product.product_name, models.Product.description)]
     if not show_all:
-        common_query = common_query.where(models.Product.enabled == True)
-
-    query = await db.execute(common_query)
-    products = query.scalars().all()
+        conditions.append(models.Product.enabled == True)
+    query = select(models.Product).where(filtering.compile_filters(filters, PRODUCT_FILTERS, *conditions))
+
+    order_by = filtering.compile_sort(sort, PRODUCT_SORT_COLUMNS)
+    if not order_by:
+        query = text_search.order_by_rank(query, search, models.Product.product_name, models.Product.description)
+        order_by = [models.Product.created_at.desc()]
+    products, total_items = await pagination.fetch_page(db, query.order_by(*order_by, models.Product.product_id), limit, page)
     
-    return {'status': 'success', 'results': len(products), 'total_pages': total_pages, 'total_items':total_items, 'products': products}
+    return {'status': 'success', 'results': len(products), 'total_pages': pagination.total_pages(total_items, limit), 'total_items':total_items, 'products': products}
 
 # create products without authentication
 async def create_product(product: CreateProductSchema, user_id: str, db: Session):
@@ -0,0 +1,88 @@
+from datetime import datetime
+from typing import List
+
+from sqlalchemy import BigInteger, String, cast, func, literal, literal_column, select
+from sqlalchemy.dialects.postgresql import insert
+
+from .. import models
+from sqlalchemy.orm import Session
+
+# pg_try_advisory_xact_lock key, so only one worker rolls up at a time.
+# Bound as bigint: asyncpg would otherwise send it as int4
+ROLLUP_LOCK_KEY = 7310420918
+ROLLUPS = {'hour': models.ScanRollupHourly, 'day': models.ScanRollupDaily}
+
+
+def rollup_insert(rollup, interval: str, start, end):
+    # inlined rather than bound, so the GROUP BY expression matches the select list
+    bucket = func.date_trunc(literal_column(f"'{interval}'"),
+                             func.timezone(literal_column("'UTC'"), models.ScanHistory.scan_time))
+    scans = (
+        select(models.ScanHistory.qr_code_id, bucket, func.count())
+        .where(models.ScanHistory.qr_code_id.is_not(None))
+        .where(models.ScanHistory.scan_time < end)
+        .group_by(models.ScanHistory.qr_code_id, bucket)
+    )
+    if start is not None:
+        scans = scans.where(models.ScanHistory.scan_time >= start)
+    statement = insert(rollup).from_select(['qr_code_id', 'bucket', 'scans'], scans)
+    return statement.on_conflict_do_update(
+        index_elements=[rollup.qr_code_id, rollup.bucket],
+        set_={'scans': rollup.scans + statement.excluded.scans},
+    )
+
+
+# add scans between the watermark and now - lag to the hourly and daily rollups
+async def roll_up_scans(db: Session, lag_seconds: int) -> bool:
+    locked = await db.scalar(select(func.pg_try_advisory_xact_lock(literal(ROLLUP_LOCK_KEY, BigInteger))))
+    if not locked:
+        await db.rollback()
+        return False
+
+    watermark = await db.get(models.ScanRollupWatermark, 1)
+    if watermark is None:
+        watermark = models.ScanRollupWatermark(id=1)
+        db.add(watermark)
+    start = watermark.rolled_up_to
+    end = await db.scalar(select(func.now() - func.make_interval(0, 0, 0, 0, 0, 0, lag_seconds)))
+    if start is not None and start >= end:
+        await db.rollback()
+        return False
+
+    for interval, rollup in ROLLUPS.items():
+        await db.execute(rollup_insert(rollup, interval, start, end))
+    watermark.rolled_up_to = end
+    await db.commit()
+    return True
+
+
+async def get_scan_series(db: Session, interval: str, start: datetime, end: datetime, qr_code_id: str = None) -> List[dict]:
+    rollup = ROLLUPS[interval]
+    query = (
+        select(rollup.bucket, func.sum(rollup.scans).label('scans'))
+        .where(rollup.bucket >= start, rollup.bucket < end)
+        .group_by(rollup.bucket)
+        .order_by(rollup.bucket)
+    )
+    if qr_code_id:
+        query = query.where(rollup.qr_code_id == qr_code_id)
+    result = await db.execute(query)
+    return [{'bucket': row.bucket, 'scans': row.scans} for row in result]
+
+
+async def get_top_scanned(db: Session, start: datetime, end: datetime, limit: int = 10) -> List[dict]:
+    rollup = models.ScanRollupDaily
+    top = (
+        select(rollup.qr_code_id, func.sum(rollup.scans).label('scans'))
+        .where(rollup.bucket >= start, rollup.bucket < end)
+        .group_by(rollup.qr_code_id)
+        .order_by(func.sum(rollup.scans).desc(), rollup.qr_code_id)
+        .limit(limit)
+        .subquery()
+    )
+    result = await db.execute(
+        select(top.c.qr_code_id, top.c.scans, models.Pet.name)
+        .outerjoin(models.Pet, cast(models.Pet.unique_id, String) == top.c.qr_code_id)
+        .order_by(top.c.scans.desc(), top.c.qr_code_id)
+    )
+    return [{'qr_code_id': row.qr_code_id, 'name': row.name, 'scans': row.scans} for row in result]
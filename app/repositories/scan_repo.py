@@ -1,8 +1,13 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime
+from typing import AsyncIterator, Dict, List
+import uuid
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import Integer, String, cast, column, func, insert, literal, select, true, tuple_, update, values
+from sqlalchemy.dialects.postgresql import UUID
 from app.schemas.scan_schema import ScanSchema
 
-from ..database import get_session
+from ..database import ReadSessionLocal, get_session
+from . import pagination
 from sqlalchemy.orm import Session
 from .. import models
 
@@ -11,11 +16,198 @@ router = APIRouter()
 
 async def save(data: ScanSchema, db: Session):
     try:
+        # an explicit None would override the server default of scan_time
+        data = dict(data)
+        if data.get('scan_time') is None:
+            data.pop('scan_time', None)
         new_pet = models.ScanHistory(**data)
         db.add(new_pet)
         await db.commit()
         await db.refresh(new_pet)
         return new_pet
-    
+
     except TimeoutError:
-        raise HTTPException(status_code=500, detail="Task timed out")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Task timed out")
+
+
+def scan_coordinates(data: dict):
+    # the scanning browser may not share its location; the scan still counts
+    try:
+        return float(data['latitude']), float(data['longitude'])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def scan_notification_message(data: dict):
+    # Message is split around the pet name so it can be assembled in SQL
+    head = "Someone scanned "
+    coordinates = scan_coordinates(data)
+    if coordinates is None:
+        return head, "'s tag anonymously."
+    link = f"https://www.google.com/maps?q={coordinates[0]},{coordinates[1]}&z=13&t=m"
+    tail = f"'s tag anonymously in <a style='color:blue;text-decoration-line: underline;'  href='{link}' target='_blank'>this</a> location."
+    return head, tail
+
+
+# record a tag scan in a single statement: bump the counter, insert the
+# scan history row and the owner's notification, then return the pet and owner.
+# record_history=False leaves the scan history row to the buffered writer and
+# increment=False leaves no_of_scans to the scan counter
+async def ingest_scan(id: str, coordinates: dict, db: Session, record_history: bool = True, increment: bool = True):
+    try:
+        head, tail = scan_notification_message(coordinates)
+
+        scanned_columns = (models.Pet.id, models.Pet.unique_id, models.Pet.name, models.Pet.owner_id, models.Pet.no_of_scans)
+        if increment:
+            scanned = (
+                update(models.Pet)
+                .where(models.Pet.unique_id == id)
+                .where(models.Pet.owner_id.is_not(None))
+                .values(no_of_scans=func.coalesce(models.Pet.no_of_scans, 0) + 1)
+                .returning(*scanned_columns)
+                .cte('scanned')
+            )
+        else:
+            scanned = (
+                select(*scanned_columns)
+                .where(models.Pet.unique_id == id)
+                .where(models.Pet.owner_id.is_not(None))
+                .cte('scanned')
+            )
+
+        notification = (
+            insert(models.Notification)
+            .from_select(
+                ['id', 'to', 'message'],
+                select(
+                    literal(uuid.uuid4(), models.Notification.id.type),
+                    cast(scanned.c.owner_id, String),
+                    func.concat(head, scanned.c.name, tail),
+                ).select_from(scanned)
+            )
+            .returning(models.Notification.id, models.Notification.message, models.Notification.created_at)
+            .cte('notification')
+        )
+
+        # the inserts yield at most one row each, so joining them on true keeps
+        # the result to a single row while forcing the CTEs to be rendered
+        query = (
+            select(
+                models.Pet.unique_id,
+                models.Pet.name,
+                models.Pet.owner_id,
+                scanned.c.no_of_scans,
+                models.User.firstname,
+                models.User.email,
+                notification.c.id.label('notification_id'),
+                notification.c.message.label('notification_message'),
+                notification.c.created_at.label('notified_at'),
+            )
+            .join(models.User, models.Pet.owner_id == models.User.id, isouter=True)
+            .join(scanned, scanned.c.id == models.Pet.id, isouter=True)
+            .join(notification, true(), isouter=True)
+            .where(models.Pet.unique_id == id)
+        )
+
+        if record_history:
+            history = (
+                insert(models.ScanHistory)
+                .from_select(
+                    ['id', 'qr_code_id'],
+                    select(literal(uuid.uuid4(), models.ScanHistory.id.type), literal(id)).select_from(scanned)
+                )
+                .returning(models.ScanHistory.id)
+                .cte('history')
+            )
+            query = query.add_columns(history.c.id.label('scan_id')).join(history, true(), isouter=True)
+
+        result = await db.execute(query)
+        row = result.first()
+        await db.commit()
+
+        if not row:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Pet not found')
+        return row
+
+    except TimeoutError:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail="Task timed out")
+
+
+# apply coalesced scan counts as one UPDATE ... FROM (VALUES ...)
+async def apply_scan_counts(deltas: Dict[str, int], db: Session):
+    if not deltas:
+        return
+    # a stable row order keeps concurrent flushes from deadlocking
+    rows = sorted((uuid.UUID(unique_id), delta) for unique_id, delta in deltas.items())
+    counts = values(
+        column('unique_id', UUID(as_uuid=True)),
+        column('delta', Integer),
+        name='counts',
+    ).data(rows)
+
+    await db.execute(
+        update(models.Pet)
+        .where(models.Pet.unique_id == counts.c.unique_id)
+        .values(no_of_scans=func.coalesce(models.Pet.no_of_scans, 0) + counts.c.delta)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+
+
+# derive no_of_scans from scan_history, for the given tags or for every pet
+async def recount_scans(db: Session, unique_ids: List[str] = None):
+    scan_count = (
+        select(func.count())
+        .select_from(models.ScanHistory)
+        .where(models.ScanHistory.qr_code_id == cast(models.Pet.unique_id, String))
+        .scalar_subquery()
+    )
+    query = update(models.Pet).values(no_of_scans=scan_count).execution_options(synchronize_session=False)
+    if unique_ids is not None:
+        if not unique_ids:
+            return
+        query = query.where(models.Pet.unique_id.in_(sorted(unique_ids)))
+
+    await db.execute(query)
+    await db.commit()
+
+
+def scan_history_query(query, qr_code_id: str = None, since: datetime = None, until: datetime = None):
+    if qr_code_id:
+        query = query.where(models.ScanHistory.qr_code_id == qr_code_id)
+    if since is not None:
+        query = query.where(models.ScanHistory.scan_time >= since)
+    if until is not None:
+        query = query.where(models.ScanHistory.scan_time < until)
+    return query.order_by(models.ScanHistory.scan_time.desc(), models.ScanHistory.id.desc())
+
+
+# newest first, in keyset pages over (scan_time, id)
+async def get_scan_history(db: Session, limit: int, cursor: str = None, qr_code_id: str = None, since: datetime = None, until: datetime = None):
+    # fetch one extra row to know whether another page follows
+    query = scan_history_query(select(models.ScanHistory), qr_code_id, since, until).limit(limit + 1)
+    if cursor:
+        scan_time, id = pagination.decode_keyset_cursor(cursor)
+        query = query.where(tuple_(models.ScanHistory.scan_time, models.ScanHistory.id) < (scan_time, id))
+
+    query = await db.execute(query)
+    scans = query.scalars().all()
+
+    next_cursor = None
+    if len(scans) > limit:
+        scans = scans[:limit]
+        next_cursor = pagination.encode_cursor(scans[-1].scan_time, str(scans[-1].id))
+
+    return {'status': 'success', 'results': len(scans), 'scans': scans, 'next_cursor': next_cursor}
+
+
+# the whole history in batches of rows, read through a server-side cursor so
+# memory stays flat however many rows match. The session is opened here
+# rather than taken from the request, so it lives exactly as long as the stream
+async def stream_scan_history(batch_size: int, qr_code_id: str = None, since: datetime = None, until: datetime = None) -> AsyncIterator[List]:
+    query = scan_history_query(select(*models.ScanHistory.__table__.columns), qr_code_id, since, until)
+    async with ReadSessionLocal() as db:
+        result = await db.stream(query.execution_options(yield_per=batch_size))
+        async for rows in result.partitions(batch_size):
+            yield rows
@@ -0,0 +1,24 @@
+from sqlalchemy import func, or_, true
+
+# Admin search matches a substring of any of a few text columns. Each searched
+# column carries a pg_trgm GIN index (see the trigram search migration), which
+# Postgres uses for ILIKE '%term%' instead of scanning the whole table.
+
+
+def search_condition(search: str, *columns):
+    if not search:
+        return true()
+    pattern = f"%{search}%"
+    return or_(*[column.ilike(pattern) for column in columns])
+
+
+def search_rank(search: str, *columns):
+    # NULL similarities are ignored by greatest()
+    return func.greatest(*[func.similarity(column, search) for column in columns])
+
+
+def order_by_rank(query, search: str, *columns):
+    # closest matches first; the caller's own ordering breaks ties
+    if not search:
+        return query
+    return query.order_by(search_rank(search, *columns).desc())
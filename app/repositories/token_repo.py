@@ -0,0 +1,33 @@
+from datetime import datetime
+from typing import List
+
+from sqlalchemy import delete, func, select
+
+from .. import models
+from sqlalchemy.orm import Session
+
+
+async def revoke_token(db: Session, user_id: str, jti: str, expires_at: datetime):
+    db.add(models.TokenRevocation(user_id=str(user_id), jti=jti, expires_at=expires_at))
+    await db.commit()
+
+
+# part of the caller's transaction: the version bump and its revocation row
+# are committed together with the password change
+def bump_token_version(db: Session, user: models.User, expires_at: datetime) -> int:
+    user.token_version = (user.token_version or 0) + 1
+    db.add(models.TokenRevocation(user_id=str(user.id), token_version=user.token_version, expires_at=expires_at))
+    return user.token_version
+
+
+async def get_revocations(db: Session, since: datetime = None) -> List[models.TokenRevocation]:
+    query = select(models.TokenRevocation).where(models.TokenRevocation.expires_at > func.now())
+    if since is not None:
+        query = query.where(models.TokenRevocation.created_at >= since)
+    result = await db.execute(query.order_by(models.TokenRevocation.created_at))
+    return result.scalars().all()
+
+
+async def purge_revocations(db: Session):
+    await db.execute(delete(models.TokenRevocation).where(models.TokenRevocation.expires_at <= func.now()))
+    await db.commit()
@@ -14,6 +14,10 @@ from ..database import get_session
 from sqlalchemy.orm import Session
 from .. import models, oauth2
 from ..config import settings
+from . import filtering, pagination, text_search, token_repo
+from ..services.password_hasher import password_hasher
+from ..services.principal_cache import principal_cache
+from ..services.token_revocations import revocation_expiry, token_revocations
 import pyotp
 from twilio.rest import Client
 from datetime import datetime, timedelta
@@ -59,7 +63,10 @@ async def confirm_password_reset(db: Session, reset_token: str, new_password: st
 
     if user:
         # Update the user's password (replace this with your actual password update logic)
-        user.password = utils.hash_password(new_password)
+        user.password = await password_hasher.hash(new_password)
+        if settings.AUTH_TOKEN_CLAIMS:
+            expires_at = revocation_expiry()
+            token_version = token_repo.bump_token_version(db, user, expires_at)
 
         # Remove the reset token from the database
         # db.delete(reset_token_obj)
@@ -67,72 +74,44 @@ async def confirm_password_reset(db: Session, reset_token: str, new_password: st
         # Commit the changes to the database
         await db.execute(delete(models.ResetToken).where(models.ResetToken.email == user.email))
         await db.commit()
+        principal_cache.invalidate(user.id)
+        if settings.AUTH_TOKEN_CLAIMS:
+            token_revocations.add_version(user.id, token_version, expires_at)
 
         return {"message": "Password reset successful"}
 
     raise HTTPException(status_code=404, detail="User not found")
 
-async def get_users(db: Session, limit: int, page: int, search: str = '', filters: str = ''):
-    skip = (page - 1) * limit
-    
-    search_condition = (
-        or_(
-            or_(
-                and_(
-                    models.User.firstname.is_(None),  # NULL values
-                    search == "",  # Empty search term
-                ),
-                and_(
-                    models.User.lastname.is_(None),  # NULL values
-                    search == "",  # Empty search term
-                )
-            ),
-            models.User.firstname.ilike(f"%{search}%"),  # Non-empty names matching the search term
-            models.User.lastname.ilike(f"%{search}%"),  # Non-empty names matching the search term
-        )
-    )
-    
-    filter_items = filters.split(',') if filters else []
-    for item in filter_items:
-        if len(item.split('=')) >= 2:
-            key, value = item.split('=')
-            if key and value:
-                if key == 'status':
-                    if value.lower() == "active":
-                        search_condition = and_(search_condition, models.User.status == 'active')
-                    elif value.lower() == "deactivated":
-                        search_condition = and_(search_condition, models.User.status == 'deactivated')
-                
-                if key == 'email':
-                    if value.lower() == "verified":
-                        search_condition = and_(search_condition, models.User.verified == True)
-                    elif value.lower() == "not-verified":
-                        search_condition = and_(search_condition, models.User.verified == False)
+USER_FILTERS: filtering.FilterSpec = {
+    'status': lambda value: {
+        'active': models.User.status == 'active',
+        'deactivated': models.User.status == 'deactivated',
+    }.get(value.lower()),
+    'email': lambda value: {
+        'verified': models.User.verified == True,
+        'not-verified': models.User.verified == False,
+    }.get(value.lower()),
+}
 
+USER_SORT_COLUMNS = {
+    'firstname': models.User.firstname,
+    'lastname': models.User.lastname,
+    'email': models.User.email,
+    'created_at': models.User.created_at,
+}
 
-    total_items = await db.scalar(
-        select(func.count())
-        .select_from(models.User)
-        .where(models.User.role == 'user')
-        .filter(search_condition)
-    )
-    
-    total_pages = -(-total_items // limit)
-    
-    query = await db.execute(
-            select(models.User)
-            .where(models.User.role == 'user')
-            .filter(search_condition)
-            .group_by(models.User.id)
-            .order_by(models.User.id.asc())  # Order by id
-            .limit(limit)
-            .offset(skip)
-        )
-    users: List[models.User] = query.scalars().all()
+async def get_users(db: Session, limit: int, page: int, search: str = '', filters: str = '', sort: str = ''):
+    search_condition = text_search.search_condition(search, models.User.firstname, models.User.lastname)
+    query = select(models.User).where(filtering.compile_filters(filters, USER_FILTERS, models.User.role == 'user', search_condition))
+
+    order_by = filtering.compile_sort(sort, USER_SORT_COLUMNS)
+    if not order_by:
+        query = text_search.order_by_rank(query, search, models.User.firstname, models.User.lastname)
+    users, total_items = await pagination.fetch_page(db, query.order_by(*order_by, models.User.id.asc()), limit, page)
     
     user_responses = [UserResponse(**user.to_dict()) for user in users]
     
-    return {'status': 'success', 'results': len(users), 'total_pages': total_pages, 'total_items':total_items, 'users': user_responses}
+    return {'status': 'success', 'results': len(users), 'total_pages': pagination.total_pages(total_items, limit), 'total_items':total_items, 'users': user_responses}
 
 
 async def get_user_details(user_id: str, db: Session):
@@ -242,7 +221,7 @@ async def add_user(db: Session, payload: CreateUserSchema):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST, detail='Passwords do not match')
         #  Hash the password
-        payload.password = utils.hash_password(payload.password)
+        payload.password = await password_hasher.hash(payload.password)
         del payload.passwordConfirm
         payload.email = EmailStr(payload.email.lower())
         new_user = models.User(**payload.dict())
@@ -281,6 +260,7 @@ async def update_user(user: UpdateUserSchema, db: Session, user_id: str):
                 setattr(updated_user, 'otp_created_at', None)
                 
             await db.commit()
+            principal_cache.invalidate(user_id)
     return updated_user
 
 async def send_sms():
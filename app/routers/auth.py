@@ -19,6 +19,10 @@ from ..database import get_session
 from app.oauth2 import AuthJWT
 from ..config import settings
 from ..email import Email
+from ..services.password_hasher import password_hasher
+from ..services.principal_cache import principal_cache
+from ..services.token_revocations import revocation_expiry, token_revocations
+from app.repositories import token_repo
 import requests
 
 import aiohttp
@@ -56,7 +60,7 @@ async def create_user(payload: CreateUserSchema, request: Request, db: Session =
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail='Passwords do not match')
     #  Hash the password
-    payload.password = utils.hash_password(payload.password)
+    payload.password = await password_hasher.hash(payload.password)
     del payload.passwordConfirm
     payload.verified = False
     payload.email = EmailStr(payload.email.lower())
@@ -99,7 +103,7 @@ async def login(payload: LoginUserSchema, response: Response, db: Session = Depe
                             detail='Incorrect Email or Password')
         
     # Check if the password is valid
-    if not utils.verify_password(payload.password, user.password):
+    if not await password_hasher.verify(payload.password, user.password):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
                             detail='Incorrect Email or Password')
 
@@ -109,13 +113,21 @@ async def login(payload: LoginUserSchema, response: Response, db: Session = Depe
                             detail='Please verify your email address')
 
 
+    access_token = issue_tokens(Authorize, response, user)
+
+    # Send both access
+    return {'status': 'success', 'access_token': access_token, 'role': user.role}
+
+
+# create access and refresh tokens for the user and store them in cookies
+def issue_tokens(Authorize: AuthJWT, response: Response, user: models.User) -> str:
     # Create access token
     access_token = Authorize.create_access_token(
-        subject=str(user.id), expires_time=timedelta(minutes=ACCESS_TOKEN_EXPIRES_IN))
+        subject=str(user.id), expires_time=timedelta(minutes=ACCESS_TOKEN_EXPIRES_IN), user_claims=oauth2.token_claims(user))
 
     # Create refresh token
     refresh_token = Authorize.create_refresh_token(
-        subject=str(user.id), expires_time=timedelta(minutes=REFRESH_TOKEN_EXPIRES_IN))
+        subject=str(user.id), expires_time=timedelta(minutes=REFRESH_TOKEN_EXPIRES_IN), user_claims=oauth2.token_claims(user))
 
     # Store refresh and access tokens in cookie
     response.set_cookie('access_token', access_token, ACCESS_TOKEN_EXPIRES_IN * 60,
@@ -124,9 +136,7 @@ async def login(payload: LoginUserSchema, response: Response, db: Session = Depe
                         REFRESH_TOKEN_EXPIRES_IN * 60, REFRESH_TOKEN_EXPIRES_IN * 60, '/', None, False, True, 'lax')
     response.set_cookie('logged_in', 'True', ACCESS_TOKEN_EXPIRES_IN * 60,
                         ACCESS_TOKEN_EXPIRES_IN * 60, '/', None, False, False, 'lax')
-
-    # Send both access
-    return {'status': 'success', 'access_token': access_token, 'role': user.role}
+    return access_token
 
 
 @router.get('/refresh')
@@ -145,8 +155,14 @@ async def refresh_token(response: Response, request: Request, Authorize: AuthJWT
         if not user:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
                                 detail='The user belonging to this token no logger exist')
+        
+        # the row is loaded anyway, so a password change is enforced here even
+        # before the revocation reaches this worker
+        if settings.AUTH_TOKEN_CLAIMS and Authorize.get_raw_jwt().get('ver', 0) < user.token_version:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
+                                detail='Token has been revoked')
         access_token = Authorize.create_access_token(
-            subject=str(user.id), expires_time=timedelta(minutes=ACCESS_TOKEN_EXPIRES_IN))
+            subject=str(user.id), expires_time=timedelta(minutes=ACCESS_TOKEN_EXPIRES_IN), user_claims=oauth2.token_claims(user))
     except Exception as e:
         error = e.__class__.__name__
         if error == 'MissingTokenError':
@@ -163,7 +179,16 @@ async def refresh_token(response: Response, request: Request, Authorize: AuthJWT
 
 
 @router.get('/logout', status_code=status.HTTP_200_OK)
-async def logout(response: Response, Authorize: AuthJWT = Depends(), user_id: str = Depends(oauth2.require_user)):
+async def logout(response: Response, request: Request, Authorize: AuthJWT = Depends(), user_id: str = Depends(oauth2.require_user)):
+    if settings.AUTH_TOKEN_CLAIMS:
+        await token_revocations.revoke_token(Authorize.get_raw_jwt())
+        refresh_token = request.cookies.get('refresh_token')
+        if refresh_token:
+            try:
+                await token_revocations.revoke_token(Authorize.get_raw_jwt(refresh_token))
+            except Exception as error:
+                # an expired or foreign refresh token needs no revoking
+                print('Error', error)
     Authorize.unset_jwt_cookies()
     response.set_cookie('logged_in', '', -1)
 
@@ -194,6 +219,7 @@ async def verify_me(token: str, request: Request, db: Session = Depends(get_sess
     
     db.add(user)
     await db.commit()
+    principal_cache.invalidate(user.id)
     return templates.TemplateResponse("success_verification.html",{"request": request})
 
 @router.post('/resend-email-verification')
@@ -235,7 +261,7 @@ async def resend_verificaiton_email(payload: dict, request: Request, db: Session
 #     return templates.TemplateResponse("success_verification.html",{"request": request})
 
 @router.post('/change_password')
-async def login(payload: ChangePasswordUserSchema, db: Session = Depends(get_session), user_id: str = Depends(oauth2.require_user)):
+async def login(payload: ChangePasswordUserSchema, response: Response, db: Session = Depends(get_session), user_id: str = Depends(oauth2.require_user), Authorize: AuthJWT = Depends()):
     # Check if the user exist
     query = await db.execute(select(models.User).where(models.User.id == user_id))
     user: models.User = query.scalar_one_or_none()
@@ -245,7 +271,7 @@ async def login(payload: ChangePasswordUserSchema, db: Session = Depends(get_ses
                             detail='You are not authenticated')
 
     # Check if the password is valid
-    if not utils.verify_password(payload.current_password, user.password):
+    if not await password_hasher.verify(payload.current_password, user.password):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
                             detail='Incorrect Password')
         
@@ -254,19 +280,29 @@ async def login(payload: ChangePasswordUserSchema, db: Session = Depends(get_ses
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail='Passwords do not match')
     #  Hash the password
-    user.password = utils.hash_password(payload.new_password)
-    
+    user.password = await password_hasher.hash(payload.new_password)
+    if settings.AUTH_TOKEN_CLAIMS:
+        expires_at = revocation_expiry()
+        token_version = token_repo.bump_token_version(db, user, expires_at)
     
     try:
         db.add(user)
         await db.commit()
+        principal_cache.invalidate(user_id)
+        if settings.AUTH_TOKEN_CLAIMS:
+            token_revocations.add_version(user_id, token_version, expires_at)
         await db.refresh(user)
-        return {'status': 'success'}
     except:
         await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail='Passwords do not match')
 
+    if settings.AUTH_TOKEN_CLAIMS:
+        # the new version revoked the caller's own tokens too; replace them
+        access_token = issue_tokens(Authorize, response, user)
+        return {'status': 'success', 'access_token': access_token}
+    return {'status': 'success'}
+
 
 # Function to get the current time
 def current_time():
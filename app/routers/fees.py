@@ -21,13 +21,13 @@ def convert_fee_response_to_filtered(response: FeeResponse) -> FilteredFeeRespon
     )
 
 @router.get('/')
-async def get_pets(db: Session = Depends(get_session), user_id: str = Depends(oauth2.require_user), limit: int = 10, page: int = 1, search: str = '', filters: str = ''):
-    response = await fees_repo.get_fees(db, limit, page, search, filters)
+async def get_pets(db: Session = Depends(get_session), user_id: str = Depends(oauth2.require_user), limit: int = 10, page: int = 1, search: str = '', filters: str = '', sort: str = ''):
+    response = await fees_repo.get_fees(db, limit, page, search, filters, sort=sort)
     return response
 
 @router.get('/filtered')
-async def get_pets(db: Session = Depends(get_session), limit: int = 10, page: int = 1, search: str = '', filters: str = ''):
-    response = await fees_repo.get_fees(db, limit, page, search, filters, False)
+async def get_pets(db: Session = Depends(get_session), limit: int = 10, page: int = 1, search: str = '', filters: str = '', sort: str = ''):
+    response = await fees_repo.get_fees(db, limit, page, search, filters, False, sort)
     response['fees'] = [convert_fee_response_to_filtered(item) for item in response['fees']]
     return response
 
@@ -0,0 +1,20 @@
+from fastapi import APIRouter, Depends
+
+from app.oauth2 import require_user
+from ..database import engine, read_engine, pool_stats
+from ..services.notification_bridge import notification_bridge
+from ..services.notification_hub import notification_hub
+from ..services.password_hasher import password_hasher
+
+router = APIRouter()
+
+
+@router.get('/')
+async def get_metrics(user_id: str = Depends(require_user)):
+    return {
+        'database': pool_stats(engine),
+        'replica': pool_stats(read_engine) if read_engine is not engine else None,
+        'password_hasher': password_hasher.stats(),
+        'notifications': notification_hub.stats(),
+        'notification_bridge': notification_bridge.stats(),
+    }
@@ -0,0 +1,74 @@
+import asyncio
+from datetime import datetime
+import json
+from typing import Optional, Tuple
+import uuid
+
+from fastapi import APIRouter, Depends, Header
+from fastapi.responses import StreamingResponse
+
+from ..config import settings
+from ..database import SessionLocal
+from ..oauth2 import require_streaming_user
+from ..repositories import notification_repo, pagination
+from ..services.notification_hub import HEARTBEAT, encode_event, notification_event, notification_hub
+
+router = APIRouter()
+
+# how long EventSource waits before reconnecting
+RETRY_MS = 3000
+
+
+def sse_event(id: str, data: str, event: str = 'notification') -> str:
+    return f"id: {id}\nevent: {event}\ndata: {data}\n\n"
+
+
+async def stream_notifications(user_id: str, after: Optional[Tuple[datetime, uuid.UUID]]):
+    # subscribed before the replay query, so nothing falls between the two
+    subscriber = notification_hub.subscribe(user_id)
+    keepalive = asyncio.create_task(notification_hub.keepalive(subscriber))
+    try:
+        yield f"retry: {RETRY_MS}\n\n"
+
+        replayed = None
+        if after is not None:
+            created_at, id = after
+            async with SessionLocal() as db:
+                notifications = await notification_repo.get_notifications_after(
+                    db, user_id, created_at, id, settings.NOTIFICATION_REPLAY_LIMIT + 1)
+            if len(notifications) > settings.NOTIFICATION_REPLAY_LIMIT:
+                # too far behind to replay; the client reloads its history
+                yield "event: reset\ndata: {}\n\n"
+                notifications = []
+            for notification in notifications:
+                replayed = (notification.created_at, str(notification.id))
+                event = notification_event(notification.id, notification.message, notification.created_at)
+                yield sse_event(pagination.encode_cursor(*replayed), json.dumps(event, default=encode_event))
+
+        # a full queue means the client fell behind; ending the stream makes
+        # it reconnect and replay from its last event id
+        while not subscriber.dropped.is_set():
+            message = await subscriber.queue.get()
+            if message == HEARTBEAT:
+                yield ": heartbeat\n\n"
+                continue
+            event = json.loads(message)
+            if event['type'] != 'notification':
+                # not part of the history, so there is no event id to resume from
+                yield f"event: {event['type']}\ndata: {message}\n\n"
+                continue
+            key = (pagination.parse_datetime(event['created_at']), str(event['id']))
+            if replayed is not None and key <= replayed:
+                continue
+            yield sse_event(pagination.encode_cursor(*key), message)
+    finally:
+        keepalive.cancel()
+        notification_hub.unsubscribe(subscriber)
+
+
+@router.get('/stream')
+async def stream(user_id: str = Depends(require_streaming_user), last_event_id: str = Header(None)):
+    # validated here, before any byte of the stream is sent
+    after = pagination.decode_keyset_cursor(last_event_id) if last_event_id else None
+    return StreamingResponse(stream_notifications(user_id, after), media_type='text/event-stream',
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
@@ -3,9 +3,8 @@ import json
 from typing import List, Optional
 import uuid
 
-from sqlalchemy import desc, select
+from sqlalchemy import select
 from app.email import Email
-from app.schemas.notification_schema import CreateNotificationSchema, NotificationBaseSchema
 from app.schemas.scan_schema import ScanSchema
 
 from app.schemas.user_schema import CreateUserSchema, UserResponse
@@ -13,13 +12,18 @@ from .. import models
 from ..schemas.pet_schema import Allergies, Medications, PetBaseSchema, PetRegisterModel, PetResponse, ListPetResponse, CreatePetSchema, PetTypeResponse, UpdatePetSchema, Vaccines
 from sqlalchemy.orm import Session
 from fastapi import Depends, File, Form, HTTPException, Query, Request, UploadFile, status, APIRouter, Response, BackgroundTasks
-from ..database import get_session
+from ..database import get_read_session, get_session
 from app.oauth2 import require_user
-from ..repositories import pet_repo, scan_repo
-import qrcode
+from ..repositories import notification_repo, pet_repo, scan_repo
+from ..services.scan_writer import scan_writer
+from ..services.scan_counter import scan_counter
+from ..services.notification_bridge import notification_bridge
+from ..services.notification_hub import notification_event, read_event
+from ..services.qr_codes import qr_cache, qr_payload
+from ..services.qr_zip import stream_qr_zip
+from ..config import settings
 from fastapi.responses import StreamingResponse
-from io import BytesIO, StringIO
-import zipfile
+from itertools import chain
 
 router = APIRouter()
 
@@ -30,25 +34,25 @@ class CustomJSONEncoder(json.JSONEncoder):
         return json.JSONEncoder.default(self, obj)
 
 @router.get('/')
-async def get_pets(db: Session = Depends(get_session), limit: int = 10, page: int = 1, search: str = '', filters: str = ''):
-    response = await pet_repo.get_pets(db, limit, page, search, filters)
+async def get_pets(db: Session = Depends(get_read_session), limit: int = 10, page: int = 1, search: str = '', filters: str = '', cursor: str = None, total: str = Query('exact', regex='^(exact|estimate|none)$'), sort: str = ''):
+    response = await pet_repo.get_pets(db, limit, page, search, filters, cursor, total, sort)
     return response
 
 
 @router.get('/mypets')
-async def get_pets(db: Session = Depends(get_session), user_id: str = Depends(require_user)):
+async def get_pets(db: Session = Depends(get_read_session), user_id: str = Depends(require_user)):
     response = await pet_repo.get_my_all_pets(db, user_id)
     return response
 
 
 @router.get('/{owner_id}/list')
-async def get_pets(owner_id: str, db: Session = Depends(get_session), user_id: str = Depends(require_user)):
+async def get_pets(owner_id: str, db: Session = Depends(get_read_session), user_id: str = Depends(require_user)):
     response = await pet_repo.get_pets_by_owner_id(owner_id, db)
     return response
 
 
 @router.get('/pet-types')
-async def get_pets(db: Session = Depends(get_session)):
+async def get_pets(db: Session = Depends(get_read_session)):
     response = await pet_repo.get_pet_types(db)
     return [{'value': entry.type_id, 'label': entry.type} for entry in response]
 
@@ -205,25 +209,25 @@ async def update_my_pet_vaccines(id: str, vaccines: Vaccines, db: Session = Depe
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
 @router.get('/{id}')
-async def get_pet(id: str, db: Session = Depends(get_session)):
+async def get_pet(id: str, db: Session = Depends(get_read_session)):
     response = await pet_repo.get_pet(id, db)
     return response
 
 # @router.get('/owner/{id}/details')
 @router.get('/owner/{id}/details', response_model=UserResponse)
-async def get_owner_details(id: str, db: Session = Depends(get_session)):
+async def get_owner_details(id: str, db: Session = Depends(get_read_session)):
     response = await pet_repo.get_owner_details(id, db)
     return response
 
 
 @router.get('/{id}/get_details')
-async def get_pet(id: str, db: Session = Depends(get_session)):
+async def get_pet(id: str, db: Session = Depends(get_read_session)):
     response = await pet_repo.check_pet(id, db)
     return response
 
 
 @router.get('/{id}/check')
-async def get_pet(id: str, db: Session = Depends(get_session)):
+async def get_pet(id: str, db: Session = Depends(get_read_session)):
     response = await pet_repo.check_pet(id, db)
     if response.owner_id is not None:
         data = {"has_owner": True}
@@ -235,85 +239,61 @@ async def send_scan_email(user: models.User, email: List[str], link: str, coordi
     sample = await Email(user=user, url=link, email=email, coordinates=coordinates, pet=pet).sendScanNotificationEmail()
     return sample
 
-async def create_notification(user: models.User, coordinates: dict, pet: models.Pet, db: Session):
-    dt = { 'to': str(user.id), 
-          'message': f"Someone scanned {pet.name}'s tag anonymously in <a style='color:blue;text-decoration-line: underline;'  href='https://www.google.com/maps?q={coordinates['latitude']},{coordinates['longitude']}&z=13&t=m' target='_blank'>this</a> location." }
-    notif = NotificationBaseSchema(**dt)
-    new_pet = models.Notification(**notif.dict())
-    db.add(new_pet)
-    await db.commit()
-    await db.refresh(new_pet)
-    return new_pet
-    
-
 @router.post('/scan/{id}')
 async def get_pet(id: str, data: dict, background_tasks: BackgroundTasks, db: Session = Depends(get_session)):
-    response, user = await pet_repo.check_pet_with_user(id, db)
-    if response.owner_id is not None:
-        scan_data = {'qr_code_id': id}
-        
-        # url = f"{request.url.scheme}://{request.client.host}:{request.url.port}/api/v2/auth/verifyemail/{token.hex()}"
-        # await Email(new_user, url, [payload.email]).sendVerificationCode()
-        
-        background_tasks.add_task(send_scan_email, user, [user.email], "facebook.com", data, response)
-        background_tasks.add_task(create_notification, user, data, response, db)
-        history = await scan_repo.save(ScanSchema(**scan_data).dict(), db)
-        # get no of scans and set 0 if null    
-        no_of_scans = 0 if response.no_of_scans is None else response.no_of_scans
-        
-        no_of_scans = no_of_scans + 1
-        response.no_of_scans = no_of_scans
-        response = await pet_repo.update_pet(id, response, db)
-        
+    scan = await scan_repo.ingest_scan(
+        id, data, db,
+        record_history=not settings.SCAN_BUFFER_ENABLED,
+        increment=settings.SCAN_COUNTER_MODE == 'inline',
+    )
+    if scan.owner_id is not None:
+        if settings.SCAN_BUFFER_ENABLED:
+            await scan_writer.enqueue(ScanSchema(qr_code_id=id))
+        if settings.SCAN_COUNTER_MODE != 'inline':
+            scan_counter.increment(str(scan.unique_id))
+        if scan.notification_id is not None:
+            notification_bridge.publish(scan.owner_id, notification_event(scan.notification_id, scan.notification_message, scan.notified_at))
+        user = models.User(id=scan.owner_id, firstname=scan.firstname, email=scan.email)
+        pet = models.Pet(unique_id=scan.unique_id, name=scan.name)
+        # the email template needs the location
+        if scan_repo.scan_coordinates(data) is not None:
+            background_tasks.add_task(send_scan_email, user, [user.email], "facebook.com", data, pet)
+
     return data
 
 @router.get('/{id}/details')
-async def get_pet(id: str, db: Session = Depends(get_session), user_id: str = Depends(require_user)):
+async def get_pet(id: str, db: Session = Depends(get_read_session), user_id: str = Depends(require_user)):
     response = await pet_repo.get_my_pet(id, user_id, db)
     return response
 
 @router.get('/{id}/notifications')
-async def get_notifications(id: str, db: Session = Depends(get_session), user_id: str = Depends(require_user)):
-    pet_query = await db.execute(
-            select(models.Notification).where(models.Notification.to == id)
-        )
-    selected_pet = pet_query.scalars().all()
-    if not selected_pet:
+async def get_notifications(id: str, db: Session = Depends(get_read_session), user_id: str = Depends(require_user),
+                            limit: int = Query(20, ge=1, le=100), cursor: str = None, since: str = None):
+    response = await notification_repo.get_notifications(db, id, limit, cursor, since)
+    if not response['notifications'] and not cursor and not since:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                             detail=f'Notification not found')
-    return selected_pet
+    return response
 
 @router.get('/{id}/notifications/load')
-async def get_notifications(id: str, db: Session = Depends(get_session), user_id: str = Depends(require_user)):
-    pet_query = await db.execute(
-            select(models.Notification).where(models.Notification.to == id).order_by(desc(models.Notification.created_at))
-        )
-    selected_pet = pet_query.scalars().all()
-    if not selected_pet:
+async def get_notifications(id: str, db: Session = Depends(get_read_session), user_id: str = Depends(require_user),
+                            limit: int = Query(20, ge=1, le=100), cursor: str = None, since: str = None):
+    response = await notification_repo.get_notifications(db, id, limit, cursor, since)
+    if not response['notifications'] and not cursor and not since:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                             detail=f'Notification not found')
-    return selected_pet
+    return response
 
 @router.get('/notifications/read')
-async def get_notifications(background_tasks: BackgroundTasks, db: Session = Depends(get_session), user_id: str = Depends(require_user)):
-    try:
-        background_tasks.add_task(pet_repo.read_notification, user_id, db)
-        return "ok"
-    except:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                            detail=f'Connection timed out')
+async def get_notifications(user_id: str = Depends(require_user), up_to: str = None):
+    updated = await notification_repo.mark_read(user_id, up_to)
+    if updated:
+        notification_bridge.publish(user_id, read_event(updated, up_to))
+    return {'status': 'success', 'results': updated}
         
 @router.get('/unread/notifications/count')
-async def get_unread_notifications_count(db: Session = Depends(get_session), user_id: str = Depends(require_user)):
-    # try:
-        pet_query = await db.execute(
-            select(models.Notification.id).where(models.Notification.to == user_id).where(models.Notification.is_read == False)
-        )
-        selected_pet = pet_query.scalars().all()
-        return { 'count' : len(selected_pet) | 0}
-    # except:
-    #     raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-    #                         detail=f'Connection timed out')
+async def get_unread_notifications_count(db: Session = Depends(get_read_session), user_id: str = Depends(require_user)):
+    return {'count': await notification_repo.get_unread_count(db, user_id)}
 
 
 @router.delete('/{id}')
@@ -481,101 +461,53 @@ async def update_pet_type(
     
     return response
 
-def generate_qr_code(data):
-    qr = qrcode.QRCode(
-        version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_L,
-        box_size=30,
-        border=4,
-    )
-    qr.add_data("https://secure-petz.info/"+str(data))
-    qr.make(fit=True)
-
-    # Generate QR code image
-    img = qr.make_image(fill_color=(13,103,181), back_color=(255,255,255))
-    # img = img.resize((1318, 1318))
-    img_bytes = BytesIO()
-    img.save(img_bytes, format='PNG')
-    img_bytes.seek(0)
-
-    return img_bytes
-
 @router.post('/download-qr-image')
 async def download_qr_image(data: dict, user_id: str = Depends(require_user)):
     try:
-        img_bytes = generate_qr_code(data['unique_id']).getvalue()
+        _, img_bytes = await qr_cache.get(qr_payload(data['unique_id']))
         return Response(content=img_bytes, media_type="image/png")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# the cacheable form of the above: the image never changes for a cache key,
+# so browsers keep it and revalidate with If-None-Match
+@router.get('/download-qr-image/{unique_id}')
+async def get_qr_image(unique_id: str, request: Request, user_id: str = Depends(require_user)):
+    payload = qr_payload(unique_id)
+    etag = f'"{qr_cache.key(payload)}"'
+    headers = {'ETag': etag, 'Cache-Control': 'private, max-age=31536000, immutable'}
+    if_none_match = request.headers.get('if-none-match', '')
+    if if_none_match.strip() == '*' or etag in [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    _, img_bytes = await qr_cache.get(payload)
+    return Response(content=img_bytes, media_type="image/png", headers=headers)
+
+
 @router.post('/generate_qr_zip')
 async def generate_qr_zip(data: list, user_id: str = Depends(require_user)):
     filtered_data = [item['unique_id'] for item in data]
-    
-    # return filtered_data
-    # Create a ZIP file in memory
-    zip_buffer = BytesIO()
-    with zipfile.ZipFile(zip_buffer, 'a', zipfile.ZIP_DEFLATED, False) as zip_file:
-        for item in filtered_data:
-            # Generate QR code for each item and add it to the ZIP file
-            qr_code_bytes = generate_qr_code(item)
-            zip_file.writestr(f'qrcode_{item}.png', qr_code_bytes.read())
 
-    # Move to the beginning of the ZIP buffer
-    zip_buffer.seek(0)
-
-    # Return the ZIP file as a response
-    return StreamingResponse(zip_buffer, media_type="application/zip", headers={'Content-Disposition': 'attachment; filename=qr_codes.zip'})
+    # Stream the ZIP file as each QR code is rendered
+    return StreamingResponse(stream_qr_zip(filtered_data), media_type="application/zip", headers={'Content-Disposition': 'attachment; filename=qr_codes.zip'})
 
 @router.post('/generate-records')
-async def generate_records(num_records: int = Query(..., title="Number of Records", ge=1, le=1000), db: Session = Depends(get_session), user_id: str = Depends(require_user)):
-    generated_pets = []
-    for _ in range(num_records):
-        pet_data = {
-            "microchip_id": None,
-            "name": None,
-            "description": None,
-            "behavior": None,
-            "weight": None,
-            "gender": None,
-            "color": None,
-            "pet_type_id": None,
-            "main_picture": None,
-            "breed": None,
-            "date_of_birth_month": None,
-            "date_of_birth_year": None,
-            "owner_id": None
-        }
-
-        pet = models.Pet(**pet_data, created_at=datetime.utcnow(), created_by=user_id, updated_at=datetime.utcnow())
-        db.add(pet)
-        generated_pets.append(pet)
+async def generate_records(num_records: int = Query(..., title="Number of Records", ge=1, le=100000), format: str = Query('json', regex='^(json|csv)$'), db: Session = Depends(get_session), user_id: str = Depends(require_user)):
+    unique_ids = await pet_repo.generate_pets(db, num_records, user_id)
 
-    await db.commit()
-    return generated_pets
+    if format == 'csv':
+        rows = (f"{unique_id},{qr_payload(unique_id)}\n" for unique_id in unique_ids)
+        return StreamingResponse(chain(["unique_id,url\n"], rows), media_type="text/csv", headers={'Content-Disposition': 'attachment; filename=generated_tags.csv'})
+    return {'status': 'success', 'results': len(unique_ids), 'unique_ids': unique_ids}
 
 
 @router.post('/generate-qr-all')
 async def generate_qr_zip(db: Session = Depends(get_session), user_id: str = Depends(require_user)):
     filtered_data = await pet_repo.get_all_pets(db)
-    # return filtered_data
-    # Create a ZIP file in memory
-    zip_buffer = BytesIO()
-    with zipfile.ZipFile(zip_buffer, 'a', zipfile.ZIP_DEFLATED, False) as zip_file:
-        for item in filtered_data:
-            # Generate QR code for each item and add it to the ZIP file
-            qr_code_bytes = generate_qr_code(item)
-            zip_file.writestr(f'qrcode_{item}.png', qr_code_bytes.read())
-            
-        csv_data = "\n".join([f"{x+1},https://secure-petz.info/{str(item)}" for x, item in enumerate(filtered_data)])
-        zip_file.writestr('pets_data.csv', csv_data)
-
-    # Move to the beginning of the ZIP buffer
-    zip_buffer.seek(0)
 
-    # Return the ZIP file as a response
-    return StreamingResponse(zip_buffer, media_type="application/zip", headers={'Content-Disposition': 'attachment; filename=qr_codes.zip'})
+    # Stream the ZIP file as each QR code is rendered, with the CSV index last
+    return StreamingResponse(stream_qr_zip(filtered_data, include_csv=True), media_type="application/zip", headers={'Content-Disposition': 'attachment; filename=qr_codes.zip'})
 
     pet_query = await db.execute(
             select(models.Pet).where(models.Pet.unique_id == id)
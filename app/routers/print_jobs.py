@@ -0,0 +1,99 @@
+import os
+import re
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from ..database import get_session
+from ..oauth2 import require_principal, require_user
+from ..repositories import print_job_repo
+from ..schemas.print_job_schema import CreatePrintJobSchema, PrintJobResponse
+from ..services.principal_cache import Principal
+from ..services.print_jobs import print_job_runner
+
+router = APIRouter()
+
+CHUNK_SIZE = 64 * 1024
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+ADMIN_ROLE = 'admin'
+
+
+# someone else's job answers like a missing one, so ids cannot be probed
+async def get_own_job(id: str, db: Session, user: Principal):
+    job = await print_job_repo.get_job(id, db)
+    if job.created_by != str(user.id) and user.role != ADMIN_ROLE:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Print job not found')
+    return job
+
+
+def read_file_range(path: str, start: int, end: int):
+    with open(path, 'rb') as artifact:
+        artifact.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = artifact.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def parse_range(header: str, size: int):
+    # only single ranges are supported; anything else gets the whole file
+    match = RANGE_PATTERN.match(header.strip())
+    if not match or match.group(1) == match.group(2) == '':
+        return None
+    first, last = match.groups()
+    if first == '':
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start > end or start >= size:
+        raise HTTPException(status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                            detail='Requested range not satisfiable',
+                            headers={'Content-Range': f'bytes */{size}'})
+    return start, end
+
+
+@router.post('/', status_code=status.HTTP_202_ACCEPTED, response_model=PrintJobResponse)
+async def create_print_job(payload: CreatePrintJobSchema = None, db: Session = Depends(get_session), user_id: str = Depends(require_user)):
+    job = await print_job_repo.create_job(db, user_id, payload.unique_ids if payload else None)
+    print_job_runner.notify()
+    return job
+
+
+@router.get('/{id}', response_model=PrintJobResponse)
+async def get_print_job(id: str, db: Session = Depends(get_session), user: Principal = Depends(require_principal)):
+    return await get_own_job(id, db, user)
+
+
+@router.get('/{id}/download')
+async def download_print_job(id: str, request: Request, db: Session = Depends(get_session), user: Principal = Depends(require_principal)):
+    job = await get_own_job(id, db, user)
+    if job.status != 'done' or not job.artifact_path or not os.path.exists(job.artifact_path):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f'Print job is {job.status}')
+
+    size = os.path.getsize(job.artifact_path)
+    etag = f'"{job.id}-{size}"'
+    headers = {
+        'Accept-Ranges': 'bytes',
+        'ETag': etag,
+        'Content-Disposition': f'attachment; filename=qr_codes_{job.id}.zip',
+    }
+
+    byte_range = None
+    range_header = request.headers.get('range')
+    if range_header and request.headers.get('if-range', etag) == etag:
+        byte_range = parse_range(range_header, size)
+
+    if byte_range is None:
+        headers['Content-Length'] = str(size)
+        return StreamingResponse(read_file_range(job.artifact_path, 0, size - 1), media_type='application/zip', headers=headers)
+
+    start, end = byte_range
+    headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+    headers['Content-Length'] = str(end - start + 1)
+    return StreamingResponse(read_file_range(job.artifact_path, start, end), status_code=status.HTTP_206_PARTIAL_CONTENT,
+                             media_type='application/zip', headers=headers)
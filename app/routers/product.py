@@ -29,13 +29,13 @@ def convert_product_response_to_filtered(response: ProductResponse) -> FilteredP
     )
 
 @router.get('/')
-async def get_pets(db: Session = Depends(get_session), user_id: str = Depends(oauth2.require_user), limit: int = 10, page: int = 1, search: str = '', filters: str = ''):
-    response = await product_repo.get_products(db, limit, page, search, filters)
+async def get_pets(db: Session = Depends(get_session), user_id: str = Depends(oauth2.require_user), limit: int = 10, page: int = 1, search: str = '', filters: str = '', sort: str = ''):
+    response = await product_repo.get_products(db, limit, page, search, filters, sort=sort)
     return response
 
 @router.get('/filtered')
-async def get_pets(db: Session = Depends(get_session), limit: int = 10, page: int = 1, search: str = '', filters: str = ''):
-    response = await product_repo.get_products(db, limit, page, search, filters, False)
+async def get_pets(db: Session = Depends(get_session), limit: int = 10, page: int = 1, search: str = '', filters: str = '', sort: str = ''):
+    response = await product_repo.get_products(db, limit, page, search, filters, False, sort)
     # response['products'] = [convert_product_response_to_filtered(item) for item in response['products']]
     return response
 
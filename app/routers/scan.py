@@ -1,18 +1,88 @@
-from fastapi import APIRouter, Depends
+import csv
+from datetime import datetime, timedelta, timezone
+import io
+import json
+from typing import AsyncIterator, List
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy import func, select
 from app.email import Email
 
-from ..database import get_session
+from ..config import settings
+from ..database import get_read_session, get_session
 from sqlalchemy.orm import Session
 from .. import models, oauth2
+from ..repositories import scan_analytics_repo, scan_repo
 
 router = APIRouter()
 
+EXPORT_COLUMNS = [column.name for column in models.ScanHistory.__table__.columns]
+
+
+def export_value(value):
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+
+async def encode_ndjson(batches: AsyncIterator[List]):
+    async for rows in batches:
+        yield ''.join(json.dumps(dict(row._mapping), default=export_value) + "\n" for row in rows)
+
+
+async def encode_csv(batches: AsyncIterator[List]):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # the header goes out before the query runs, so the download starts at once
+    writer.writerow(EXPORT_COLUMNS)
+    yield buffer.getvalue()
+    async for rows in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue()
+
 
 @router.get('/')
-async def get_scan_history(db: Session = Depends(get_session), user_id: str = Depends(oauth2.require_user)):
-    query = await db.execute(
-            select(models.ScanHistory)
-        )
-    pets = query.scalars().all()
-    return pets
+async def get_scan_history(db: Session = Depends(get_read_session), user_id: str = Depends(oauth2.require_user),
+                           limit: int = Query(50, ge=1, le=1000), cursor: str = None, qr_code_id: str = None,
+                           since: datetime = None, until: datetime = None):
+    return await scan_repo.get_scan_history(db, limit, cursor, qr_code_id, since, until)
+
+
+@router.get('/export')
+async def export_scan_history(user_id: str = Depends(oauth2.require_streaming_user), format: str = Query('ndjson', regex='^(ndjson|csv)$'),
+                              qr_code_id: str = None, since: datetime = None, until: datetime = None):
+    batches = scan_repo.stream_scan_history(settings.SCAN_EXPORT_BATCH_SIZE, qr_code_id, since, until)
+    if format == 'csv':
+        return StreamingResponse(encode_csv(batches), media_type="text/csv", headers={'Content-Disposition': 'attachment; filename=scan_history.csv'})
+    return StreamingResponse(encode_ndjson(batches), media_type="application/x-ndjson", headers={'Content-Disposition': 'attachment; filename=scan_history.ndjson'})
+
+
+def analytics_window(start: datetime, end: datetime, default_days: int):
+    # rollup buckets are UTC and timezone-naive
+    end = end or datetime.utcnow()
+    start = start or end - timedelta(days=default_days)
+    if start.tzinfo is not None:
+        start = start.astimezone(timezone.utc).replace(tzinfo=None)
+    if end.tzinfo is not None:
+        end = end.astimezone(timezone.utc).replace(tzinfo=None)
+    if start >= end:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='start must be before end')
+    return start, end
+
+
+@router.get('/analytics/series')
+async def get_scan_series(db: Session = Depends(get_read_session), user_id: str = Depends(oauth2.require_user),
+                          qr_code_id: str = None, interval: str = Query('day', regex='^(hour|day)$'),
+                          start: datetime = None, end: datetime = None):
+    start, end = analytics_window(start, end, 2 if interval == 'hour' else 30)
+    series = await scan_analytics_repo.get_scan_series(db, interval, start, end, qr_code_id)
+    return {'status': 'success', 'interval': interval, 'start': start, 'end': end, 'series': series}
+
+
+@router.get('/analytics/top')
+async def get_top_scanned(db: Session = Depends(get_read_session), user_id: str = Depends(oauth2.require_user),
+                          limit: int = Query(10, ge=1, le=100), start: datetime = None, end: datetime = None):
+    start, end = analytics_window(start, end, 30)
+    top = await scan_analytics_repo.get_top_scanned(db, start, end, limit)
+    return {'status': 'success', 'start': start, 'end': end, 'results': top}
@@ -16,14 +16,7 @@ from fastapi.responses import HTMLResponse
 from ..config import settings
 import pyotp
 import json
-from ..utils import encrypt
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
-from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
-from cryptography.hazmat.primitives.padding import PKCS7
-from cryptography.hazmat.backends import default_backend
-from base64 import b64encode
-import os
+from ..services.response_encryption import response_encryptor
 
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
@@ -31,26 +24,15 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 router = APIRouter()
 
 @router.get('/')
-async def get_users(db: Session = Depends(get_session), limit: int = 10, page: int = 1, search: str = '', filters: str = '', user_id: str = Depends(oauth2.require_user)):
-    response = await user_repo.get_users(db, limit, page, search, filters)
+async def get_users(db: Session = Depends(get_session), limit: int = 10, page: int = 1, search: str = '', filters: str = '', sort: str = '', user_id: str = Depends(oauth2.require_user)):
+    response = await user_repo.get_users(db, limit, page, search, filters, sort)
     return response
 
 @router.get('/details')
 async def get_me(db: Session = Depends(get_session), user_id: str = Depends(oauth2.require_user)):
     try:
         user = await user_repo.get_user_details(user_id, db)
-        user_dict = user.to_dict()
-        user_json = json.dumps(user_dict, default=str)
-        
-        backend = default_backend()
-        salt = os.urandom(16)
-        kdf = PBKDF2HMAC(algorithm=hashes.SHA256(), length=32, salt=salt, iterations=100000, backend=backend)
-        key = kdf.derive(b"PetNFC1234")
-
-
-        encrypted_data = encrypt(key, user_json)
-        key_to_decrypt = b64encode(key).decode("utf-8")
-        return {"data": encrypted_data, "key": key_to_decrypt}
+        return await response_encryptor.encrypt(user.to_dict())
     
     except HTTPException as e:
         return ({"status_code":status.HTTP_500_INTERNAL_SERVER_ERROR, "detail":"Timeout Error"})
@@ -0,0 +1,25 @@
+from datetime import datetime
+from typing import List
+import uuid
+from pydantic import BaseModel
+
+
+class CreatePrintJobSchema(BaseModel):
+    # leave empty to print every tag
+    unique_ids: List[str] | None = None
+
+
+class PrintJobResponse(BaseModel):
+    id: uuid.UUID
+    status: str
+    total: int | None = None
+    completed: int = 0
+    artifact_size: int | None = None
+    error: str | None = None
+    created_at: datetime
+    created_by: str | None = None
+    updated_at: datetime
+    finished_at: datetime | None = None
+
+    class Config:
+        orm_mode = True
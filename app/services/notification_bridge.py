@@ -0,0 +1,181 @@
+import asyncio
+from collections import deque
+import json
+import time
+from typing import Deque, Tuple
+
+import asyncpg
+
+from ..config import settings
+from .notification_counts import unread_counts
+from .notification_hub import encode_event, notification_hub
+
+# Postgres rejects NOTIFY payloads of 8000 bytes or more
+MAX_PAYLOAD_BYTES = 7500
+MAX_RECONNECT_DELAY = 30
+# an idle listening connection is checked this often, so a dead one is noticed
+KEEPALIVE_SECONDS = 30
+
+
+def deliver(user_id, event: dict):
+    if event.get('type') == 'notification':
+        unread_counts.add(user_id, 1)
+    elif event.get('type') == 'read':
+        unread_counts.add(user_id, -event['count'])
+    notification_hub.publish(user_id, event)
+
+
+class NotificationBridge:
+    """Carries notification events to whichever worker holds the user's sockets.
+
+    Each worker keeps one dedicated connection that LISTENs on channel and
+    hands every event it hears to its local hub, its own events included.
+    publish() only queues the event; every flush_interval seconds the queue
+    goes out as NOTIFY payloads of many events each, so a burst of scans
+    costs a few NOTIFYs rather than one per scan.
+
+    A lost connection is reopened with backoff, keeping up to max_pending
+    events queued meanwhile. Events other workers sent during the outage
+    are missed; clients catch up from the notification history.
+    """
+
+    def __init__(self, channel: str, flush_interval: float, max_pending: int):
+        self.channel = channel
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.pending: Deque[Tuple[str, dict]] = deque()
+        self.connection: asyncpg.Connection = None
+        self.active_at = 0.0
+        self.closed = asyncio.Event()
+        self.task: asyncio.Task = None
+        self.sent = 0
+        self.received = 0
+        self.dropped = 0
+        self.reconnects = 0
+
+    @property
+    def running(self):
+        return self.task is not None and not self.task.done()
+
+    @property
+    def connected(self):
+        return self.connection is not None and not self.connection.is_closed()
+
+    def publish(self, user_id, event: dict):
+        if not self.running:
+            deliver(user_id, event)
+        elif len(self.pending) < self.max_pending:
+            self.pending.append((str(user_id), event))
+        else:
+            self.dropped += 1
+
+    async def start(self):
+        if not self.running:
+            self.closed.clear()
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.running:
+            self.closed.set()
+            await self.task
+        self.task = None
+
+    async def connect(self):
+        connection = await asyncpg.connect(
+            host=settings.POSTGRES_HOSTNAME,
+            port=settings.DATABASE_PORT,
+            user=settings.POSTGRES_USER,
+            password=settings.POSTGRES_PASSWORD,
+            database=settings.POSTGRES_DB,
+            command_timeout=settings.DB_COMMAND_TIMEOUT or None,
+        )
+        await connection.add_listener(self.channel, self.on_notify)
+        self.connection = connection
+        self.active_at = time.monotonic()
+
+    def on_notify(self, connection, pid, channel, payload):
+        self.received += 1
+        try:
+            events = json.loads(payload)
+        except ValueError as error:
+            print('Error', error)
+            return
+        for user_id, event in events:
+            deliver(user_id, event)
+
+    async def _run(self):
+        delay = 0
+        while not self.closed.is_set():
+            try:
+                if not self.connected:
+                    if delay:
+                        self.reconnects += 1
+                    await self.connect()
+                    delay = 0
+                await self.flush()
+                if time.monotonic() - self.active_at > KEEPALIVE_SECONDS:
+                    await self.connection.execute('SELECT 1')
+                    self.active_at = time.monotonic()
+                await asyncio.sleep(self.flush_interval)
+                continue
+            except Exception as error:
+                print('Error', error)
+            await self.disconnect()
+            delay = min(delay * 2 or 1, MAX_RECONNECT_DELAY)
+            try:
+                await asyncio.wait_for(self.closed.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+        try:
+            if self.connected:
+                await self.flush()
+        except Exception as error:
+            print('Error', error)
+        await self.disconnect()
+
+    async def disconnect(self):
+        connection, self.connection = self.connection, None
+        if connection is not None and not connection.is_closed():
+            try:
+                await connection.close(timeout=5)
+            except Exception:
+                connection.terminate()
+
+    async def flush(self):
+        while self.pending:
+            batch = []
+            size = 2
+            for item in self.pending:
+                encoded = json.dumps(item, default=encode_event)
+                if batch and size + len(encoded) + 1 > MAX_PAYLOAD_BYTES:
+                    break
+                batch.append(encoded)
+                size += len(encoded) + 1
+            if size > MAX_PAYLOAD_BYTES:
+                # too large for NOTIFY on its own, so it only reaches this worker
+                deliver(*self.pending.popleft())
+                continue
+            await self.connection.execute('SELECT pg_notify($1, $2)', self.channel, '[' + ','.join(batch) + ']')
+            # removed only once sent, so a failed NOTIFY is retried after reconnecting
+            for _ in batch:
+                self.pending.popleft()
+            self.sent += 1
+            self.active_at = time.monotonic()
+
+    def stats(self) -> dict:
+        return {
+            'connected': self.connected,
+            'pending': len(self.pending),
+            'sent': self.sent,
+            'received': self.received,
+            'dropped': self.dropped,
+            'reconnects': self.reconnects,
+        }
+
+
+notification_bridge = NotificationBridge(
+    channel=settings.NOTIFICATION_CHANNEL,
+    flush_interval=settings.NOTIFICATION_BRIDGE_FLUSH_MS / 1000,
+    max_pending=settings.NOTIFICATION_BRIDGE_MAX_PENDING,
+)
@@ -0,0 +1,51 @@
+from typing import List, Optional
+
+from cachetools import TTLCache
+
+from ..config import settings
+
+
+class UnreadCounts:
+    """Unread notification counts per user, kept for a short TTL.
+
+    New notifications and mark-read adjust a cached count in place rather
+    than dropping it, so the badge poll is answered from memory. Adjusting
+    an entry does not extend its TTL. Each worker process has its own counts,
+    so the TTL bounds how long a change made by another worker goes unseen.
+
+    A count read from the database may or may not include a change applied
+    while the query ran, so put() is given the user's generation read before
+    the query and is dropped if anything changed since.
+    """
+
+    def __init__(self, max_users: int, ttl: float):
+        # values are one-item lists, so add() can update them without
+        # resetting their expiry
+        self.counts = TTLCache(maxsize=max_users, ttl=ttl)
+        self.generations = TTLCache(maxsize=max_users, ttl=ttl)
+
+    def get(self, user_id) -> Optional[int]:
+        entry: List[int] = self.counts.get(str(user_id))
+        return entry[0] if entry is not None else None
+
+    def generation(self, user_id) -> int:
+        return self.generations.get(str(user_id), 0)
+
+    def put(self, user_id, count: int, generation: int):
+        if generation == self.generation(user_id):
+            self.counts[str(user_id)] = [count]
+
+    def add(self, user_id, delta: int):
+        user_id = str(user_id)
+        self.generations[user_id] = self.generation(user_id) + 1
+        entry = self.counts.get(user_id)
+        if entry is not None:
+            entry[0] = max(entry[0] + delta, 0)
+
+    def invalidate(self, user_id):
+        user_id = str(user_id)
+        self.generations[user_id] = self.generation(user_id) + 1
+        self.counts.pop(user_id, None)
+
+
+unread_counts = UnreadCounts(settings.NOTIFICATION_COUNT_MAX_USERS, settings.NOTIFICATION_COUNT_TTL_SECONDS)
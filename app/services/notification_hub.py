@@ -0,0 +1,147 @@
+import asyncio
+from datetime import datetime
+import json
+from typing import Dict, Set
+
+from fastapi import WebSocket, status
+
+from ..config import settings
+
+HEARTBEAT = json.dumps({'type': 'heartbeat'})
+
+
+def encode_event(value):
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+
+def notification_event(id, message: str, created_at) -> dict:
+    return {'type': 'notification', 'id': id, 'message': message, 'created_at': created_at}
+
+
+def read_event(count: int, up_to: str = None) -> dict:
+    return {'type': 'read', 'count': count, 'up_to': up_to}
+
+
+class Subscriber:
+    """One connected client of a user, with its own bounded send queue."""
+
+    def __init__(self, user_id: str, queue_size: int):
+        self.user_id = user_id
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = asyncio.Event()
+
+    def offer(self, message: str) -> bool:
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            self.dropped.set()
+            return False
+
+
+class NotificationHub:
+    """Fans notifications out to every connection of the target user.
+
+    publish() never waits on a client: each connection has a queue of at
+    most queue_size messages, and a connection whose queue is full is
+    dropped instead of holding back the others. The client reconnects and
+    catches up from the notification history. A heartbeat goes out every
+    heartbeat_seconds, so proxies keep the socket open and dead peers are
+    noticed.
+    """
+
+    def __init__(self, queue_size: int, heartbeat_seconds: float):
+        self.queue_size = queue_size
+        self.heartbeat_seconds = heartbeat_seconds
+        self.subscribers: Dict[str, Set[Subscriber]] = {}
+        self.published = 0
+        self.dropped = 0
+
+    def subscribe(self, user_id: str) -> Subscriber:
+        subscriber = Subscriber(str(user_id), self.queue_size)
+        self.subscribers.setdefault(subscriber.user_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        subscribers = self.subscribers.get(subscriber.user_id)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self.subscribers[subscriber.user_id]
+
+    # returns how many local connections the event was queued for
+    def publish(self, user_id, event: dict) -> int:
+        subscribers = self.subscribers.get(str(user_id))
+        if not subscribers:
+            return 0
+        # encoded once, however many connections the user has
+        message = json.dumps(event, default=encode_event)
+        delivered = 0
+        for subscriber in list(subscribers):
+            if subscriber.offer(message):
+                delivered += 1
+            else:
+                self.dropped += 1
+                self.unsubscribe(subscriber)
+        self.published += 1
+        return delivered
+
+    async def serve_websocket(self, websocket: WebSocket, user_id: str):
+        await websocket.accept()
+        subscriber = self.subscribe(user_id)
+        sender = asyncio.create_task(self._send(websocket, subscriber))
+        tasks = [
+            sender,
+            asyncio.create_task(self._receive(websocket, subscriber)),
+            asyncio.create_task(self.keepalive(subscriber)),
+            asyncio.create_task(subscriber.dropped.wait()),
+        ]
+        for task in tasks:
+            # a disconnect surfaces as an exception in one of them
+            task.add_done_callback(lambda task: task.cancelled() or task.exception())
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+            # nothing may be sent once the socket is closed
+            await asyncio.gather(sender, return_exceptions=True)
+            self.unsubscribe(subscriber)
+
+        if subscriber.dropped.is_set():
+            try:
+                await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+            except Exception:
+                pass
+
+    async def _send(self, websocket: WebSocket, subscriber: Subscriber):
+        while True:
+            await websocket.send_text(await subscriber.queue.get())
+
+    async def keepalive(self, subscriber: Subscriber):
+        # queued like any other message, so a client that stopped reading
+        # is dropped even when it gets no notifications
+        while True:
+            await asyncio.sleep(self.heartbeat_seconds)
+            subscriber.offer(HEARTBEAT)
+
+    async def _receive(self, websocket: WebSocket, subscriber: Subscriber):
+        # clients ping to check the connection; the answer is queued so
+        # only the sender writes to the socket
+        while True:
+            await websocket.receive_text()
+            subscriber.offer('pong')
+
+    def stats(self) -> dict:
+        return {
+            'users': len(self.subscribers),
+            'connections': sum(len(subscribers) for subscribers in self.subscribers.values()),
+            'published': self.published,
+            'dropped': self.dropped,
+        }
+
+
+notification_hub = NotificationHub(
+    queue_size=settings.NOTIFICATION_QUEUE_SIZE,
+    heartbeat_seconds=settings.NOTIFICATION_HEARTBEAT_SECONDS,
+)
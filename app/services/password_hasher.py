@@ -0,0 +1,91 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+from fastapi import HTTPException, status
+
+from .. import utils
+from ..config import settings
+
+
+class PasswordHasher:
+    """Runs bcrypt hashing and verification off the event loop.
+
+    bcrypt releases the GIL while it works, so a small thread pool is enough
+    to keep a login storm from stalling every other request on the worker.
+    At most `workers` calls run at once; the rest wait their turn, and once
+    `max_waiting` are already queued new calls are turned away with a 503
+    instead of piling up behind the pool.
+    """
+
+    def __init__(self, workers: int, max_waiting: int):
+        self.workers = workers
+        self.max_waiting = max_waiting
+        self.executor: ThreadPoolExecutor = None
+        self.slots: asyncio.Semaphore = None
+        self.running = 0
+        self.waiting = 0
+        self.peak_waiting = 0
+        self.completed = 0
+        self.rejected = 0
+        self.busy_seconds = 0.0
+        self.wait_seconds = 0.0
+
+    def get_executor(self) -> ThreadPoolExecutor:
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='password-hasher')
+            self.slots = asyncio.Semaphore(self.workers)
+        return self.executor
+
+    async def run(self, fn, *args):
+        executor = self.get_executor()
+        if self.waiting >= self.max_waiting:
+            self.rejected += 1
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                detail='Too many requests, please try again shortly')
+
+        queued_at = time.perf_counter()
+        self.waiting += 1
+        self.peak_waiting = max(self.peak_waiting, self.waiting)
+        try:
+            await self.slots.acquire()
+        finally:
+            self.waiting -= 1
+
+        started_at = time.perf_counter()
+        self.wait_seconds += started_at - queued_at
+        self.running += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+        finally:
+            self.running -= 1
+            self.completed += 1
+            self.busy_seconds += time.perf_counter() - started_at
+            self.slots.release()
+
+    async def hash(self, password: str) -> str:
+        return await self.run(utils.hash_password, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self.run(utils.verify_password, password, hashed_password)
+
+    def stats(self) -> dict:
+        return {
+            'workers': self.workers,
+            'running': self.running,
+            'waiting': self.waiting,
+            'peak_waiting': self.peak_waiting,
+            'completed': self.completed,
+            'rejected': self.rejected,
+            'avg_wait_ms': round(self.wait_seconds * 1000 / self.completed, 2) if self.completed else 0,
+            'avg_hash_ms': round(self.busy_seconds * 1000 / self.completed, 2) if self.completed else 0,
+        }
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+            self.slots = None
+
+
+password_hasher = PasswordHasher(settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_MAX_WAITING)
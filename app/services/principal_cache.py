@@ -0,0 +1,47 @@
+from typing import NamedTuple, Optional
+
+from cachetools import TTLCache
+
+from ..config import settings
+
+
+class Principal(NamedTuple):
+    id: str
+    verified: bool
+    role: str
+    status: str
+
+
+class PrincipalCache:
+    """What require_user needs to know about a user, kept for a short TTL.
+
+    Entries are evicted least recently used once max_users is reached. Code
+    that changes a user's verified flag, role, status or password calls
+    invalidate() after committing. Each worker process has its own cache, so
+    the TTL bounds how long another worker can serve a stale entry.
+
+    A lookup that started before an invalidation must not put its (possibly
+    stale) row back, so put() is given the generation read before the query.
+    """
+
+    def __init__(self, max_users: int, ttl: float):
+        self.entries = TTLCache(maxsize=max_users, ttl=ttl)
+        self.generation = 0
+
+    def get(self, user_id: str) -> Optional[Principal]:
+        return self.entries.get(user_id)
+
+    def put(self, principal: Principal, generation: int):
+        if generation == self.generation:
+            self.entries[principal.id] = principal
+
+    def invalidate(self, user_id):
+        self.generation += 1
+        self.entries.pop(str(user_id), None)
+
+    def clear(self):
+        self.generation += 1
+        self.entries.clear()
+
+
+principal_cache = PrincipalCache(settings.AUTH_CACHE_MAX_USERS, settings.AUTH_CACHE_TTL_SECONDS)
@@ -0,0 +1,153 @@
+import asyncio
+from datetime import timedelta
+import os
+from pathlib import Path
+from typing import List
+
+from sqlalchemy import func
+
+from ..config import settings
+from ..database import SessionLocal
+from ..repositories import pet_repo, print_job_repo
+from .qr_zip import stream_qr_zip
+
+SWEEP_INTERVAL = 60 * 60
+
+
+class PrintJobRunner:
+    """Builds QR print-run archives in the background.
+
+    Jobs live in the print_jobs table, so a restart loses nothing: each
+    worker claims the next queued job (or one whose worker went quiet for
+    stale_after) and writes the archive to <directory>/<job id>.zip. QR
+    rendering itself runs on the shared process pool from qr_zip.
+
+    Once a job has been finished for longer than retention its archive is
+    deleted and the job marked expired; the sweep runs every
+    sweep_interval seconds.
+    """
+
+    def __init__(self, directory: str, workers: int, poll_interval: float, stale_after: timedelta,
+                 retention: timedelta, sweep_interval: float = SWEEP_INTERVAL):
+        self.directory = Path(directory)
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self.retention = retention
+        self.sweep_interval = sweep_interval
+        self.wakeup = asyncio.Event()
+        self.tasks: List[asyncio.Task] = []
+
+    def artifact_path(self, id) -> Path:
+        return self.directory / f"{id}.zip"
+
+    def notify(self):
+        self.wakeup.set()
+
+    async def start(self):
+        if not self.tasks:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self.tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+            self.tasks.append(asyncio.create_task(self._sweep()))
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    async def _work(self):
+        while True:
+            try:
+                async with SessionLocal() as db:
+                    job = await print_job_repo.claim_next_job(db, self.stale_after)
+            except Exception as error:
+                print('Error', error)
+                job = None
+
+            if job is None:
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self.wakeup.clear()
+                continue
+
+            await self.run_job(job.id, job.unique_ids)
+
+    async def _sweep(self):
+        while True:
+            try:
+                await self.sweep()
+            except Exception as error:
+                print('Error', error)
+            await asyncio.sleep(self.sweep_interval)
+
+    async def sweep(self) -> int:
+        async with SessionLocal() as db:
+            ids = await print_job_repo.expire_jobs(db, self.retention)
+        for id in ids:
+            path = self.artifact_path(id)
+            # a failed job may have left its partial archive behind
+            for artifact in (path, path.with_name(path.name + '.part')):
+                try:
+                    artifact.unlink(missing_ok=True)
+                except OSError as error:
+                    print('Error', error)
+        return len(ids)
+
+    async def save(self, id, **values):
+        async with SessionLocal() as db:
+            await print_job_repo.update_progress(id, db, **values)
+
+    async def run_job(self, id, unique_ids: List[str] = None):
+        try:
+            if unique_ids is None:
+                async with SessionLocal() as db:
+                    unique_ids = await pet_repo.get_all_pets(db)
+            total = len(unique_ids)
+            await self.save(id, total=total)
+
+            # persist progress roughly every percent; it also serves as
+            # the heartbeat that keeps the job from looking stale
+            step = max(total // 100, 50)
+            progress = {'completed': 0, 'saved': 0}
+
+            def on_entry(completed: int):
+                progress['completed'] = completed
+
+            path = self.artifact_path(id)
+            part_path = path.with_name(path.name + '.part')
+            with open(part_path, 'wb') as artifact:
+                async for chunk in stream_qr_zip(unique_ids, include_csv=True, on_entry=on_entry):
+                    artifact.write(chunk)
+                    if progress['completed'] - progress['saved'] >= step:
+                        progress['saved'] = progress['completed']
+                        await self.save(id, completed=progress['completed'])
+            os.replace(part_path, path)
+
+            await self.save(
+                id,
+                status='done',
+                completed=total,
+                artifact_path=str(path),
+                artifact_size=path.stat().st_size,
+                finished_at=func.now(),
+            )
+
+        except asyncio.CancelledError:
+            # shutting down: hand the job straight back to the queue
+            await asyncio.shield(self.save(id, status='queued', completed=0))
+            raise
+        except Exception as error:
+            print('Error', error)
+            await self.save(id, status='failed', error=str(error), finished_at=func.now())
+
+
+print_job_runner = PrintJobRunner(
+    directory=settings.PRINT_JOB_DIR,
+    workers=settings.PRINT_JOB_WORKERS,
+    poll_interval=settings.PRINT_JOB_POLL_SECONDS,
+    stale_after=timedelta(seconds=settings.PRINT_JOB_STALE_SECONDS),
+    retention=timedelta(seconds=settings.PRINT_JOB_RETENTION_SECONDS),
+)
@@ -0,0 +1,100 @@
+import hashlib
+from io import BytesIO
+import os
+from pathlib import Path
+import threading
+from typing import Tuple
+
+from cachetools import LRUCache
+import qrcode
+from starlette.concurrency import run_in_threadpool
+
+from ..config import settings
+
+QR_BASE_URL = "https://secure-petz.info/"
+QR_BOX_SIZE = 30
+QR_BORDER = 4
+QR_FILL_COLOR = (13, 103, 181)
+QR_BACK_COLOR = (255, 255, 255)
+
+
+def qr_payload(unique_id) -> str:
+    return QR_BASE_URL + str(unique_id)
+
+
+def render_qr_png(payload: str, box_size: int = QR_BOX_SIZE, border: int = QR_BORDER) -> bytes:
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=box_size,
+        border=border,
+    )
+    qr.add_data(payload)
+    qr.make(fit=True)
+
+    img = qr.make_image(fill_color=QR_FILL_COLOR, back_color=QR_BACK_COLOR)
+    img_bytes = BytesIO()
+    img.save(img_bytes, format='PNG')
+    return img_bytes.getvalue()
+
+
+class QRCodeCache:
+    """Rendered QR code PNGs, keyed by payload and render parameters.
+
+    The rendered image is a pure function of its key, so the key doubles as
+    the ETag. Lookups go through an in-memory LRU bounded by max_bytes, then
+    a content-addressed store on disk, and only render on a miss of both.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = Path(directory)
+        self.memory = LRUCache(maxsize=max_bytes, getsizeof=len)
+        self.lock = threading.Lock()
+
+    def key(self, payload: str, box_size: int = QR_BOX_SIZE, border: int = QR_BORDER) -> str:
+        params = f"{payload}|{box_size}|{border}|{QR_FILL_COLOR}|{QR_BACK_COLOR}|png"
+        return hashlib.sha256(params.encode('utf-8')).hexdigest()
+
+    def path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.png"
+
+    def lookup(self, key: str) -> bytes:
+        with self.lock:
+            return self.memory.get(key)
+
+    def remember(self, key: str, png: bytes):
+        # an image larger than the whole budget is served but not kept
+        if len(png) <= self.memory.maxsize:
+            with self.lock:
+                self.memory[key] = png
+
+    def load_or_render(self, key: str, payload: str, box_size: int = QR_BOX_SIZE, border: int = QR_BORDER) -> bytes:
+        path = self.path(key)
+        try:
+            png = path.read_bytes()
+        except FileNotFoundError:
+            png = render_qr_png(payload, box_size, border)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # write then rename so concurrent readers never see a partial file
+            tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp_path.write_bytes(png)
+            os.replace(tmp_path, path)
+        self.remember(key, png)
+        return png
+
+    def get_sync(self, payload: str, box_size: int = QR_BOX_SIZE, border: int = QR_BORDER) -> Tuple[str, bytes]:
+        key = self.key(payload, box_size, border)
+        png = self.lookup(key)
+        if png is None:
+            png = self.load_or_render(key, payload, box_size, border)
+        return key, png
+
+    async def get(self, payload: str, box_size: int = QR_BOX_SIZE, border: int = QR_BORDER) -> Tuple[str, bytes]:
+        key = self.key(payload, box_size, border)
+        png = self.lookup(key)
+        if png is None:
+            png = await run_in_threadpool(self.load_or_render, key, payload, box_size, border)
+        return key, png
+
+
+qr_cache = QRCodeCache(settings.QR_CACHE_DIR, settings.QR_CACHE_MAX_BYTES)
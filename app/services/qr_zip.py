@@ -0,0 +1,99 @@
+import asyncio
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import time
+from typing import AsyncIterator, Callable, Iterable, Sequence, Tuple
+import zipfile
+
+from ..config import settings
+from .qr_codes import qr_payload, render_qr_png
+
+render_pool: ProcessPoolExecutor = None
+
+
+def get_render_pool() -> ProcessPoolExecutor:
+    global render_pool
+    if render_pool is None:
+        render_pool = ProcessPoolExecutor(max_workers=settings.QR_RENDER_WORKERS)
+    return render_pool
+
+
+def shutdown_render_pool():
+    global render_pool
+    if render_pool is not None:
+        render_pool.shutdown(wait=False, cancel_futures=True)
+        render_pool = None
+
+
+class ZipChunks:
+    """Write-only sink for zipfile; the response drains it after every entry.
+
+    It has no tell()/seek(), so zipfile writes each entry with a trailing
+    data descriptor instead of seeking back to patch its header.
+    """
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+async def render_qr_codes(unique_ids: Iterable) -> AsyncIterator[Tuple[str, bytes]]:
+    # keep a bounded window of renders in flight and hand them back in order
+    loop = asyncio.get_running_loop()
+    pool = get_render_pool()
+    window = deque()
+    try:
+        for unique_id in unique_ids:
+            window.append((unique_id, loop.run_in_executor(pool, render_qr_png, qr_payload(unique_id))))
+            if len(window) >= settings.QR_RENDER_WORKERS * 2:
+                unique_id, future = window.popleft()
+                yield unique_id, await future
+        while window:
+            unique_id, future = window.popleft()
+            yield unique_id, await future
+    finally:
+        for unique_id, future in window:
+            future.cancel()
+
+
+async def aenumerate(iterator: AsyncIterator):
+    x = 0
+    async for item in iterator:
+        yield x, item
+        x += 1
+
+
+async def stream_qr_zip(unique_ids: Sequence, include_csv: bool = False, on_entry: Callable[[int], None] = None) -> AsyncIterator[bytes]:
+    sink = ZipChunks()
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_STORED) as zip_file:
+        # PNGs are already deflated, so they are stored as is
+        async for x, (unique_id, png) in aenumerate(render_qr_codes(unique_ids)):
+            zip_file.writestr(f'qrcode_{unique_id}.png', png)
+            if on_entry:
+                on_entry(x + 1)
+            yield sink.drain()
+
+        if include_csv:
+            info = zipfile.ZipInfo('pets_data.csv', date_time=time.localtime()[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED
+            with zip_file.open(info, 'w') as csv_file:
+                for x, unique_id in enumerate(unique_ids):
+                    line = f"{x+1},{qr_payload(unique_id)}"
+                    csv_file.write((line if x == 0 else "\n" + line).encode('utf-8'))
+                    if x % 1000 == 999:
+                        yield sink.drain()
+            yield sink.drain()
+
+    # closing the archive writes the central directory
+    yield sink.drain()
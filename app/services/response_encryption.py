@@ -0,0 +1,55 @@
+import asyncio
+from base64 import b64encode
+import json
+import os
+
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from starlette.concurrency import run_in_threadpool
+
+from .. import utils
+from ..config import settings
+
+PBKDF2_ITERATIONS = 100000
+
+
+def derive_key(secret: bytes, salt: bytes) -> bytes:
+    kdf = PBKDF2HMAC(algorithm=hashes.SHA256(), length=32, salt=salt, iterations=PBKDF2_ITERATIONS, backend=default_backend())
+    return kdf.derive(secret)
+
+
+class ResponseEncryptor:
+    """Encrypts a response payload and hands back the key alongside it.
+
+    The key used to be derived with PBKDF2 (100,000 iterations) and a fresh
+    salt on every request. Clients never derive it themselves, they only use
+    the key sent back, so it is derived once per process (off the event loop)
+    and reused. Payloads are small enough that AES is cheaper than a thread
+    hop; only those above offload_bytes are encrypted in the threadpool.
+    """
+
+    def __init__(self, secret: str, offload_bytes: int):
+        self.secret = secret.encode('utf-8')
+        self.offload_bytes = offload_bytes
+        self.key: bytes = None
+        self.lock = asyncio.Lock()
+
+    async def get_key(self) -> bytes:
+        if self.key is None:
+            async with self.lock:
+                if self.key is None:
+                    self.key = await run_in_threadpool(derive_key, self.secret, os.urandom(16))
+        return self.key
+
+    async def encrypt(self, data) -> dict:
+        key = await self.get_key()
+        payload = json.dumps(data, default=str)
+        if len(payload) > self.offload_bytes:
+            encrypted_data = await run_in_threadpool(utils.encrypt, key, payload)
+        else:
+            encrypted_data = utils.encrypt(key, payload)
+        return {"data": encrypted_data, "key": b64encode(key).decode("utf-8")}
+
+
+response_encryptor = ResponseEncryptor(settings.PROFILE_ENCRYPTION_SECRET, settings.PROFILE_ENCRYPTION_OFFLOAD_BYTES)
@@ -0,0 +1,79 @@
+import asyncio
+from typing import Dict
+
+from ..config import settings
+from ..database import SessionLocal
+from ..repositories import scan_repo
+
+
+class ScanCounter:
+    """Coalesces no_of_scans increments per tag.
+
+    In 'buffered' mode the pending deltas are applied every flush_interval
+    seconds as one bulk UPDATE, so a hot tag takes its row lock once per
+    flush instead of once per scan. In 'history' mode the touched tags are
+    recounted from scan_history instead, which keeps the counter exact even
+    if a flush is lost. Those tags are recounted again on the next flush to
+    pick up scans that were still in the scan history write buffer.
+    """
+
+    def __init__(self, mode: str, flush_interval: float):
+        self.mode = mode
+        self.flush_interval = flush_interval
+        self.pending: Dict[str, int] = {}
+        self.settling: Dict[str, int] = {}
+        self.closed = asyncio.Event()
+        self.task: asyncio.Task = None
+
+    @property
+    def running(self):
+        return self.task is not None and not self.task.done()
+
+    def increment(self, unique_id: str, delta: int = 1):
+        self.pending[unique_id] = self.pending.get(unique_id, 0) + delta
+
+    async def start(self):
+        if not self.running:
+            self.closed.clear()
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.running:
+            self.closed.set()
+            await self.task
+        self.task = None
+        await self.flush()
+
+    async def _run(self):
+        while not self.closed.is_set():
+            try:
+                await asyncio.wait_for(self.closed.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
+
+    async def flush(self):
+        pending, self.pending = self.pending, {}
+        if self.mode == 'history':
+            recount = {**self.settling, **pending}
+            self.settling = pending
+            pending = recount
+        if not pending:
+            return
+        try:
+            async with SessionLocal() as db:
+                if self.mode == 'history':
+                    await scan_repo.recount_scans(db, list(pending))
+                else:
+                    await scan_repo.apply_scan_counts(pending, db)
+        except Exception as error:
+            print('Error', error)
+            # keep the deltas for the next flush rather than losing scans
+            for unique_id, delta in pending.items():
+                self.increment(unique_id, delta)
+
+
+scan_counter = ScanCounter(
+    mode=settings.SCAN_COUNTER_MODE,
+    flush_interval=settings.SCAN_COUNTER_FLUSH_MS / 1000,
+)
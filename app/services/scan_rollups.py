@@ -0,0 +1,58 @@
+import asyncio
+
+from ..config import settings
+from ..database import SessionLocal
+from ..repositories import scan_analytics_repo
+
+
+class ScanRollupWorker:
+    """Keeps the hourly and daily scan rollups up to date.
+
+    Every interval seconds it adds the scans recorded since the last run to
+    the rollup tables, stopping lag seconds short of now so scans still in
+    the history write buffer are counted on a later run instead of skipped.
+    Any number of workers can run this; an advisory lock lets one of them
+    do the work and the rest skip the round.
+    """
+
+    def __init__(self, interval: float, lag_seconds: int):
+        self.interval = interval
+        self.lag_seconds = lag_seconds
+        self.closed = asyncio.Event()
+        self.task: asyncio.Task = None
+
+    @property
+    def running(self):
+        return self.task is not None and not self.task.done()
+
+    async def start(self):
+        if not self.running:
+            self.closed.clear()
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.running:
+            self.closed.set()
+            await self.task
+        self.task = None
+
+    async def _run(self):
+        while not self.closed.is_set():
+            await self.roll_up()
+            try:
+                await asyncio.wait_for(self.closed.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def roll_up(self):
+        try:
+            async with SessionLocal() as db:
+                await scan_analytics_repo.roll_up_scans(db, self.lag_seconds)
+        except Exception as error:
+            print('Error', error)
+
+
+scan_rollup_worker = ScanRollupWorker(
+    interval=settings.SCAN_ROLLUP_INTERVAL_SECONDS,
+    lag_seconds=settings.SCAN_ROLLUP_LAG_SECONDS,
+)
@@ -0,0 +1,124 @@
+import asyncio
+from datetime import datetime, timezone
+from typing import List
+import uuid
+
+from sqlalchemy import insert
+from sqlalchemy.exc import DataError, IntegrityError
+
+from .. import models
+from ..config import settings
+from ..database import SessionLocal
+from ..schemas.scan_schema import ScanSchema
+
+MAX_RETRY_DELAY = 30
+
+
+class ScanHistoryWriter:
+    """Write-behind buffer for scan history rows.
+
+    Scans are queued in memory and written with one multi-row INSERT once
+    batch_size rows are pending or flush_interval seconds have passed since
+    the first one. The queue is bounded, so enqueue() waits when the
+    database falls behind instead of growing without limit.
+
+    A batch that fails to insert goes back to the head of the buffer and
+    is retried with backoff, so a database outage delays rows rather than
+    losing them. Rows are only dropped when the database rejects them, or
+    when it is still unreachable at shutdown.
+    """
+
+    def __init__(self, batch_size: int, flush_interval: float, max_pending: int):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+        self.retry: List[dict] = []
+        self.retry_delay = 0
+        self.stopping = asyncio.Event()
+        self.task: asyncio.Task = None
+        self.written = 0
+        self.dropped = 0
+
+    @property
+    def running(self):
+        return self.task is not None and not self.task.done()
+
+    async def start(self):
+        if not self.running:
+            self.stopping.clear()
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        # the sentinel is queued behind every pending scan, so the
+        # runner drains them all before it exits
+        if self.running:
+            self.stopping.set()
+            await self.queue.put(None)
+            await self.task
+        self.task = None
+
+    async def enqueue(self, scan: ScanSchema):
+        row = scan.dict()
+        row['id'] = uuid.uuid4()
+        row['scan_time'] = row['scan_time'] or datetime.now(timezone.utc)
+        await self.queue.put(row)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        closing = False
+        while not closing:
+            if self.retry:
+                batch, self.retry = self.retry, []
+                await self.flush(batch)
+                continue
+
+            row = await self.queue.get()
+            if row is None:
+                break
+
+            batch = [row]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    row = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if row is None:
+                    closing = True
+                    break
+                batch.append(row)
+
+            await self.flush(batch)
+
+    async def flush(self, batch: List[dict]):
+        try:
+            async with SessionLocal() as db:
+                await db.execute(insert(models.ScanHistory).values(batch))
+                await db.commit()
+            self.written += len(batch)
+            self.retry_delay = 0
+        except (DataError, IntegrityError) as error:
+            # retrying would fail the same way
+            print('Error', error)
+            self.dropped += len(batch)
+        except Exception as error:
+            print('Error', error)
+            if self.stopping.is_set():
+                self.dropped += len(batch)
+                return
+            self.retry = batch
+            self.retry_delay = min(self.retry_delay * 2 or 1, MAX_RETRY_DELAY)
+            try:
+                await asyncio.wait_for(self.stopping.wait(), self.retry_delay)
+            except asyncio.TimeoutError:
+                pass
+
+
+scan_writer = ScanHistoryWriter(
+    batch_size=settings.SCAN_BUFFER_BATCH_SIZE,
+    flush_interval=settings.SCAN_BUFFER_FLUSH_MS / 1000,
+    max_pending=settings.SCAN_BUFFER_MAX_PENDING,
+)
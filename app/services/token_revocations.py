@@ -0,0 +1,116 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+import time
+from typing import Dict, Tuple
+
+from .. import models
+from ..config import settings
+from ..database import SessionLocal
+from ..repositories import token_repo
+
+# rows are read back from this far before the newest one already seen, so a
+# revocation committed late by a slow transaction is still picked up
+SYNC_OVERLAP = timedelta(seconds=60)
+PURGE_INTERVAL = 3600
+
+
+def revocation_expiry() -> datetime:
+    # no token issued before now outlives the longest token lifetime
+    return datetime.now(timezone.utc) + timedelta(minutes=settings.REFRESH_TOKEN_EXPIRES_IN)
+
+
+class TokenRevocations:
+    """Revoked tokens, checked in memory on every authenticated request.
+
+    Logging out revokes the session's tokens by jti until they would have
+    expired anyway. Changing a password revokes all of a user's tokens by
+    raising the lowest token version still accepted. Both live in dicts, so
+    is_revoked() is O(1) and never touches the database.
+
+    Every revocation is also written to token_revocations. With a non-zero
+    sync_interval each worker pulls in the rows written by the others, so a
+    revocation reaches every worker within that interval.
+    """
+
+    def __init__(self, sync_interval: float):
+        self.sync_interval = sync_interval
+        self.tokens: Dict[str, float] = {}
+        self.versions: Dict[str, Tuple[int, float]] = {}
+        self.synced_until: datetime = None
+        self.purged_at: float = None
+        self.closed = asyncio.Event()
+        self.task: asyncio.Task = None
+
+    @property
+    def running(self):
+        return self.task is not None and not self.task.done()
+
+    def is_revoked(self, claims: dict) -> bool:
+        if claims.get('jti') in self.tokens:
+            return True
+        revoked = self.versions.get(claims.get('sub'))
+        return revoked is not None and claims.get('ver', 0) < revoked[0]
+
+    def add_token(self, jti: str, expires_at: datetime):
+        self.tokens[jti] = expires_at.timestamp()
+
+    def add_version(self, user_id, version: int, expires_at: datetime):
+        current = self.versions.get(str(user_id))
+        if current is None or version >= current[0]:
+            self.versions[str(user_id)] = (version, expires_at.timestamp())
+
+    def add(self, revocation: models.TokenRevocation):
+        if revocation.jti:
+            self.add_token(revocation.jti, revocation.expires_at)
+        if revocation.token_version is not None:
+            self.add_version(revocation.user_id, revocation.token_version, revocation.expires_at)
+
+    def prune(self):
+        now = time.time()
+        self.tokens = {jti: expires for jti, expires in self.tokens.items() if expires > now}
+        self.versions = {user_id: revoked for user_id, revoked in self.versions.items() if revoked[1] > now}
+
+    async def revoke_token(self, claims: dict):
+        expires_at = datetime.fromtimestamp(claims['exp'], timezone.utc) if claims.get('exp') else revocation_expiry()
+        self.add_token(claims['jti'], expires_at)
+        async with SessionLocal() as db:
+            await token_repo.revoke_token(db, claims['sub'], claims['jti'], expires_at)
+
+    async def start(self):
+        if not self.running and self.sync_interval > 0:
+            self.closed.clear()
+            await self.sync()
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.running:
+            self.closed.set()
+            await self.task
+        self.task = None
+
+    async def _run(self):
+        while not self.closed.is_set():
+            try:
+                await asyncio.wait_for(self.closed.wait(), self.sync_interval)
+            except asyncio.TimeoutError:
+                pass
+            await self.sync()
+
+    async def sync(self):
+        since = self.synced_until - SYNC_OVERLAP if self.synced_until else None
+        try:
+            async with SessionLocal() as db:
+                revocations = await token_repo.get_revocations(db, since)
+                if self.purged_at is None or time.monotonic() - self.purged_at > PURGE_INTERVAL:
+                    await token_repo.purge_revocations(db)
+                    self.purged_at = time.monotonic()
+        except Exception as error:
+            print('Error', error)
+            return
+        for revocation in revocations:
+            self.add(revocation)
+            self.synced_until = max(self.synced_until or revocation.created_at, revocation.created_at)
+        self.prune()
+
+
+token_revocations = TokenRevocations(sync_interval=settings.AUTH_REVOCATION_SYNC_SECONDS)
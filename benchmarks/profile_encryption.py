@@ -0,0 +1,49 @@
+"""Per-call cost of encrypting a /user/details payload: per-request PBKDF2 vs the cached key.
+
+Usage:
+    python -m benchmarks.profile_encryption [--calls 200] [--payload-bytes 2000]
+
+Pure CPU, no database needed.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from app import utils
+from app.services.response_encryption import ResponseEncryptor, derive_key
+
+
+def legacy_encrypt(data):
+    # mirrors the handler before the key was cached
+    key = derive_key(b"PetNFC1234", os.urandom(16))
+    return utils.encrypt(key, json.dumps(data, default=str))
+
+
+async def run(label: str, encrypt, data, calls: int):
+    started = time.perf_counter()
+    for _ in range(calls):
+        await encrypt(data)
+    elapsed = time.perf_counter() - started
+    print(f'{label:>8}: {calls} calls in {elapsed:.2f}s -> {elapsed * 1000000 / calls:.0f} us/call')
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--calls', type=int, default=200)
+    parser.add_argument('--payload-bytes', type=int, default=2000)
+    args = parser.parse_args()
+
+    data = {'email': 'user@example.com', 'firstname': 'x' * args.payload_bytes}
+    encryptor = ResponseEncryptor('PetNFC1234', offload_bytes=64 * 1024)
+
+    async def legacy(data):
+        return legacy_encrypt(data)
+
+    await run('legacy', legacy, data, args.calls)
+    await run('cached', encryptor.encrypt, data, args.calls)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
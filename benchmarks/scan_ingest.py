@@ -0,0 +1,65 @@
+"""Scans/sec for the tag scan path: legacy multi-commit flow vs single statement ingestion.
+
+Usage:
+    python -m benchmarks.scan_ingest <pet unique_id> [--scans 2000] [--concurrency 50]
+
+The pet must already have an owner. Every scan writes real scan_history and
+notifications rows, so point it at a scratch database.
+"""
+import argparse
+import asyncio
+import time
+
+from app import models
+from app.database import SessionLocal
+from app.repositories import pet_repo, scan_repo
+from app.schemas.notification_schema import NotificationBaseSchema
+from app.schemas.scan_schema import ScanSchema
+
+COORDINATES = {'latitude': -33.8688, 'longitude': 151.2093}
+
+
+async def legacy_scan(id: str):
+    # mirrors the handler before scan_repo.ingest_scan existed
+    async with SessionLocal() as db:
+        response, user = await pet_repo.check_pet_with_user(id, db)
+        await scan_repo.save(ScanSchema(qr_code_id=id).dict(), db)
+        response.no_of_scans = (response.no_of_scans or 0) + 1
+        await pet_repo.update_pet(id, response, db)
+        head, tail = scan_repo.scan_notification_message(COORDINATES)
+        notif = NotificationBaseSchema(to=str(user.id), message=f"{head}{response.name}{tail}")
+        db.add(models.Notification(**notif.dict()))
+        await db.commit()
+
+
+async def ingest_scan(id: str):
+    async with SessionLocal() as db:
+        await scan_repo.ingest_scan(id, COORDINATES, db)
+
+
+async def run(label: str, scan, id: str, scans: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await scan(id)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(scans)))
+    elapsed = time.perf_counter() - started
+    print(f'{label:>8}: {scans} scans in {elapsed:.2f}s -> {scans / elapsed:.0f} scans/sec')
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('unique_id')
+    parser.add_argument('--scans', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=50)
+    args = parser.parse_args()
+
+    await run('legacy', legacy_scan, args.unique_id, args.scans, args.concurrency)
+    await run('ingest', ingest_scan, args.unique_id, args.scans, args.concurrency)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
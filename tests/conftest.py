@@ -0,0 +1,29 @@
+import os
+
+# app.config requires these; the tests never reach Postgres, SMTP or JWT signing
+for name, value in {
+    'DATABASE_PORT': '5432',
+    'POSTGRES_PASSWORD': 'postgres',
+    'POSTGRES_USER': 'postgres',
+    'POSTGRES_DB': 'postgres',
+    'POSTGRES_HOST': 'localhost',
+    'POSTGRES_HOSTNAME': 'localhost',
+    'JWT_PUBLIC_KEY': 'eA==',
+    'JWT_PRIVATE_KEY': 'eA==',
+    'REFRESH_TOKEN_EXPIRES_IN': '60',
+    'ACCESS_TOKEN_EXPIRES_IN': '15',
+    'JWT_ALGORITHM': 'RS256',
+    'CLIENT_ORIGIN': 'http://localhost:3000',
+    'VERIFICATION_SECRET': 'secret',
+    'EMAIL_HOST': 'localhost',
+    'EMAIL_PORT': '25',
+    'EMAIL_USERNAME': 'user',
+    'EMAIL_PASSWORD': 'password',
+    'EMAIL_FROM': 'noreply@example.com',
+    'ENCRYPTION_KEY': 'key',
+    'TWILIO_ACCOUNT_SSID': 'sid',
+    'TWILIO_AUTH_TOKEN': 'token',
+    'SENDGRID_API_KEY': 'key',
+    'OTP_SECRET': 'secret',
+}.items():
+    os.environ.setdefault(name, value)
@@ -0,0 +1,66 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from fastapi import HTTPException
+import pytest
+
+from app.repositories import pagination, pet_repo
+
+
+class Result:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return self.rows
+
+
+class KeysetSession:
+    """Answers pet_repo's keyset queries from a list, newest first."""
+
+    def __init__(self, pets):
+        self.pets = sorted(pets, key=lambda pet: (pet.created_at, pet.id), reverse=True)
+
+    async def execute(self, query):
+        params = list(query.compile().params.values())
+        rows = self.pets
+        # the (created_at, id) position is bound as a timestamp and the id after it
+        for index, value in enumerate(params):
+            if isinstance(value, datetime):
+                position = (value, params[index + 1])
+                rows = [pet for pet in rows if (pet.created_at, pet.id) < position]
+                break
+        return Result(rows[:query._limit])
+
+
+def make_pets(count):
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    # pairs share a created_at, so the id decides the order between them
+    return [SimpleNamespace(id=id, created_at=start + timedelta(minutes=id // 2)) for id in range(1, count + 1)]
+
+
+def test_next_cursor_fetches_the_following_page():
+    db = KeysetSession(make_pets(5))
+
+    first = asyncio.run(pet_repo.get_pets(db, 2, 1, cursor='', total='none'))
+    assert [pet.id for pet in first['pets']] == [5, 4]
+
+    second = asyncio.run(pet_repo.get_pets(db, 2, 1, cursor=first['next_cursor'], total='none'))
+    assert [pet.id for pet in second['pets']] == [3, 2]
+
+    last = asyncio.run(pet_repo.get_pets(db, 2, 1, cursor=second['next_cursor'], total='none'))
+    assert [pet.id for pet in last['pets']] == [1]
+    assert last['next_cursor'] is None
+
+
+def test_integer_cursor_rejects_other_ids():
+    created_at = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    assert pagination.decode_keyset_cursor(pagination.encode_cursor(created_at, 7), int) == (created_at, 7)
+    for id in ('7', 7.5, True, 'a4d4f6c2-3b1e-4f55-9c0e-2f9c5b8e1d10'):
+        with pytest.raises(HTTPException) as error:
+            pagination.decode_keyset_cursor(pagination.encode_cursor(created_at, id), int)
+        assert error.value.status_code == 400